@@ -9,7 +9,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from core.backtest import BacktestEngine
 from core.trade_manager import TradeManager
-from config.settings import Settings
+from config.settings import Settings, get_settings
 from core.utils import setup_logging, clear_screen
 import logging
 
@@ -131,7 +131,7 @@ def main() -> None:
     clear_screen()
     
     try:
-        settings = Settings()
+        settings = get_settings()
         logger = setup_logging(settings)
         
     except Exception as e:
@@ -4,6 +4,7 @@ Loads from .env file and provides validation
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional, Tuple
 from decimal import Decimal
@@ -50,6 +51,7 @@ class Settings(BaseSettings):
 
     STRATEGY_MODE: str = "ensemble_aggressive"  # ensemble, ensemble_aggressive, mean_reversion, breakout, trend_following, ensemble_ultra
     REQUIRE_MTF_ALIGNMENT: bool = True  # True = conservador (exige alinhamento), False = agressivo
+    SIGNAL_COOLDOWN_SECONDS: int = 0  # 0 = sem cooldown (igual ao backtest)
     
     # Risk Management
     RISK_PER_TRADE: Decimal = Decimal("0.015")  # 1.2% of equity per trade
@@ -95,6 +97,10 @@ class Settings(BaseSettings):
         default="sqlite:///db/state.db",
         env="DATABASE_URL"
     )
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600  # segundos
     
     # Backtest Configuration
     # BACKTEST_START_DATE: str = "2024-01-01"
@@ -124,6 +130,9 @@ class Settings(BaseSettings):
     SLACK_ENABLED: bool = Field(default=False, env="SLACK_ENABLED")
     SLACK_WEBHOOK_URL: str = Field(default="", env="SLACK_WEBHOOK_URL")
     
+    # Nível mínimo das notificações do bot (INFO, WARNING, ERROR); abaixo dele nem são montadas
+    NOTIFY_LEVEL: str = Field(default="INFO", env="NOTIFY_LEVEL")
+    
     # API Rate Limiting
     MAX_REQUESTS_PER_MINUTE: int = 1200
     RATE_LIMIT_BUFFER: float = 0.8  # Use 80% of limit
@@ -140,6 +149,9 @@ class Settings(BaseSettings):
     # Performance
     USE_ASYNC: bool = True
     MAX_WORKERS: int = 4
+    SCAN_CONCURRENCY: int = 8  # Threads para buscar klines/analisar pares em paralelo
+    USE_KLINE_STREAM: bool = False  # True = loop disparado por fechamento de candle via WebSocket
+    USE_PRICE_STREAM: bool = False  # True = SL/TP monitorados por miniTicker via WebSocket
     
     # Monitoring
     ENABLE_WEB_DASHBOARD: bool = False
@@ -306,4 +318,10 @@ class Settings(BaseSettings):
                 logger.info("✓ Time is synced with testnet")
                 
         except Exception as e:
-            logger.warning(f"Could not sync time with testnet: {e}")
\ No newline at end of file
+            logger.warning(f"Could not sync time with testnet: {e}")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide Settings instance (.env parsed and validated once)"""
+    return Settings()
@@ -1,4 +1,6 @@
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -7,16 +9,19 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from pathlib import Path
-import json
 
 from core.exchange import BinanceExchange
 from core.risk import RiskManager
-from core.strategy import StrategyFactory, MultiTimeframeAnalyzer
+from core.strategy import StrategyFactory, MultiTimeframeAnalyzer, SIGNAL_STRENGTH_THRESHOLD
 from core.utils import (
-    calculate_sharpe_ratio, calculate_sortino_ratio,
-    calculate_max_drawdown, format_percentage, safe_decimal
+    calculate_risk_ratios, calculate_max_drawdown, format_percentage, safe_decimal
 )
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
 
 class BacktestTrade:
     """Represents a trade in backtest with partial take profit support"""
@@ -55,6 +60,11 @@ class BacktestTrade:
         self.tp2_hit = False
         self.tp3_hit = False
         
+        # Espelhos float dos níveis: checagem por candle sem construir Decimal
+        self.stop_loss_f = float(stop_loss)
+        self.take_profit_f = float(take_profit)
+        self._tp_levels_f = (float(self.tp1), float(self.tp2), float(self.tp3))
+        
         self.exit_price: Optional[Decimal] = None
         self.exit_time: Optional[datetime] = None
         self.pnl: Decimal = Decimal('0')
@@ -64,6 +74,37 @@ class BacktestTrade:
         self.exit_reason: str = ''
         self.partial_exits: List[Dict] = []  # Histórico de saídas parciais
     
+    def next_tp_touched(self, price: float) -> bool:
+        """Float pre-check: does `price` reach the next pending TP level?"""
+        if self.tp3_hit:
+            return False
+        level = self._tp_levels_f[0 if not self.tp1_hit else 1 if not self.tp2_hit else 2]
+        return price >= level if self.side == 'BUY' else price <= level
+    
+    def next_event_index(
+        self,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        closes: np.ndarray,
+        start: int
+    ) -> int:
+        """
+        First candle index >= start that can trigger next TP, SL or TP
+        
+        Same float checks as BacktestEngine._update_trade, evaluated as one
+        mask over the remaining candles; len(closes) when none triggers.
+        """
+        c, h, l = closes[start:], highs[start:], lows[start:]
+        if self.side == 'BUY':
+            mask = (l <= self.stop_loss_f) | (h >= self.take_profit_f)
+        else:
+            mask = (h >= self.stop_loss_f) | (l <= self.take_profit_f)
+        if not self.tp3_hit:
+            level = self._tp_levels_f[0 if not self.tp1_hit else 1 if not self.tp2_hit else 2]
+            mask |= (c >= level) if self.side == 'BUY' else (c <= level)
+        hits = np.flatnonzero(mask)
+        return start + int(hits[0]) if hits.size else len(closes)
+    
     def check_partial_tp(
         self,
         current_price: Decimal,
@@ -199,6 +240,12 @@ class BacktestEngine:
         self.settings = settings
         self.logger = logging.getLogger('TradingBot.Backtest')
         
+        # ✅ Slippage dobrado em um multiplicador por lado (mesmo Decimal que preço - preço*slippage)
+        self._exit_slippage_mult = {
+            'BUY': 1 - settings.SLIPPAGE_PERCENT,
+            'SELL': 1 + settings.SLIPPAGE_PERCENT,
+        }
+        
         # Initialize components
         self.risk_manager = RiskManager(settings)
         self.strategy = StrategyFactory.create_strategy(settings.STRATEGY_MODE)
@@ -220,6 +267,9 @@ class BacktestEngine:
         self.last_signal_time: Dict[str, datetime] = {}
         self.signal_cooldown_seconds = 0  # Backtest NÃO usa cooldown
         
+        # ✅ Cliente público reutilizado entre chamadas de load_data (criado sob demanda)
+        self._exchange: Optional[BinanceExchange] = None
+        
         self.logger.info("Backtest engine initialized")
     
     def load_data(
@@ -261,13 +311,13 @@ class BacktestEngine:
             self.logger.info("Fetching from Binance API...")
             
             # Use a dummy exchange connection (no API keys needed for public data)
-            exchange = BinanceExchange("", "", testnet=False)
+            exchange = self._get_exchange()
             
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
             
-            # Fetch data in chunks
-            all_data = []
+            # Fetch data in chunks (janelas independentes: baixadas em paralelo)
+            windows = []
             current_start = start_dt
             
             while current_start < end_dt:
@@ -275,19 +325,23 @@ class BacktestEngine:
                     current_start + timedelta(days=30),
                     end_dt
                 )
-                
+                windows.append((current_start, chunk_end))
+                current_start = chunk_end
+            
+            def fetch_chunk(window: Tuple[datetime, datetime]) -> pd.DataFrame:
                 chunk_df = exchange.get_klines(
                     symbol=symbol,
                     interval=timeframe,
-                    start_time=current_start,
-                    end_time=chunk_end,
+                    start_time=window[0],
+                    end_time=window[1],
                     limit=1000
                 )
-                
-                all_data.append(chunk_df)
-                current_start = chunk_end
-                
-                self.logger.info(f"Fetched data up to {current_start}")
+                self.logger.info(f"Fetched data up to {window[1]}")
+                return chunk_df
+            
+            workers = max(1, min(self.settings.MAX_WORKERS, len(windows)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                all_data = list(pool.map(fetch_chunk, windows))
             
             # Combine all chunks
             df = pd.concat(all_data)
@@ -305,6 +359,18 @@ class BacktestEngine:
             self.logger.error(f"Failed to load data: {e}", exc_info=True)
             raise
     
+    def _get_exchange(self) -> BinanceExchange:
+        """Return the shared public-data client, creating it on first use"""
+        if self._exchange is None:
+            self._exchange = BinanceExchange("", "", testnet=False)
+        return self._exchange
+    
+    def _close_exchange(self) -> None:
+        """Close the shared client, if one was opened"""
+        if self._exchange is not None:
+            self._exchange.close()
+            self._exchange = None
+    
     def run(self) -> Dict:
         """
         Run backtest simulation
@@ -343,6 +409,8 @@ class BacktestEngine:
             except Exception as e:
                 self.logger.error(f"Error backtesting {symbol}: {e}", exc_info=True)
         
+        self._close_exchange()
+        
         # Calculate final results
         results = self._calculate_results()
         
@@ -363,39 +431,55 @@ class BacktestEngine:
     ) -> None:
         """Simulate trading on historical data"""
         
+        # OHLC como arrays (máscaras de eventos) e listas de float (acesso por candle)
+        high_arr = entry_df['high'].to_numpy(dtype=np.float64)
+        low_arr = entry_df['low'].to_numpy(dtype=np.float64)
+        close_arr = entry_df['close'].to_numpy(dtype=np.float64)
+        highs = high_arr.tolist()
+        lows = low_arr.tolist()
+        closes = close_arr.tolist()
+        
+        # Próximo candle em que o trade aberto pode disparar TP parcial/SL/TP;
+        # os candles entre eventos não passam por _update_trade
+        next_event = 0
+        
         # Iterate through each candle
         for i in range(200, len(entry_df)):  # Start after enough history
             current_time = entry_df.index[i]
-            current_candle = entry_df.iloc[i]
-            
-            # Get historical data up to current point
-            primary_history = primary_df.loc[:current_time]
-            entry_history = entry_df.loc[:current_time]
+            close = closes[i]
             
             # Update open trades
-            if symbol in self.open_trades:
+            trade = self.open_trades.get(symbol)
+            if trade is not None and i >= next_event:
                 self._update_trade(
                     symbol,
-                    current_candle['high'],
-                    current_candle['low'],
-                    current_candle['close'],
+                    highs[i],
+                    lows[i],
+                    close,
                     current_time
                 )
+                trade = self.open_trades.get(symbol)
+                if trade is not None:
+                    next_event = trade.next_event_index(high_arr, low_arr, close_arr, i + 1)
             
             # ✅ SINCRONIZAÇÃO: Check for new signals SEM COOLDOWN
             # Backtest não tem latência, então pode processar todo candle
-            if symbol not in self.open_trades:
+            if trade is None:
+                # Get historical data up to current point
+                primary_history = primary_df.loc[:current_time]
+                entry_history = entry_df.loc[:current_time]
+                
                 signal, strength, metadata = self.mtf_analyzer.analyze(
                     primary_history.tail(500),
                     entry_history.tail(500)
                 )
                 
-                # ✅ SINCRONIZAÇÃO: Mesmo threshold que testnet/live (0.40)
-                if signal in ['BUY', 'SELL'] and strength > 0.40:
+                # ✅ SINCRONIZAÇÃO: Mesmo threshold que testnet/live (SIGNAL_STRENGTH_THRESHOLD)
+                if signal in ['BUY', 'SELL'] and strength > SIGNAL_STRENGTH_THRESHOLD:
                     self._open_trade(
                         symbol,
                         signal,
-                        current_candle['close'],
+                        close,
                         current_time,
                         entry_history.tail(100),
                         strength=strength
@@ -403,11 +487,15 @@ class BacktestEngine:
                     
                     # Log para debug (sem cooldown)
                     self.last_signal_time[symbol] = current_time
+                    
+                    opened = self.open_trades.get(symbol)
+                    if opened is not None:
+                        next_event = opened.next_event_index(
+                            high_arr, low_arr, close_arr, i + 1
+                        )
             
             # Track equity
-            current_equity = self._calculate_current_equity(
-                current_candle['close']
-            )
+            current_equity = self._calculate_current_equity(close)
             self.equity_curve.append(current_equity)
     
     def _open_trade(
@@ -494,12 +582,14 @@ class BacktestEngine:
         
         trade = self.open_trades[symbol]
         
-        # Check PARTIAL TAKE PROFITS first!
-        tp_hit = trade.check_partial_tp(
-            Decimal(str(close)),
-            time,
-            self.settings.TAKER_FEE
-        )
+        # Check PARTIAL TAKE PROFITS first! (Decimal só quando o nível é tocado)
+        tp_hit = None
+        if trade.next_tp_touched(close):
+            tp_hit = trade.check_partial_tp(
+                Decimal(str(close)),
+                time,
+                self.settings.TAKER_FEE
+            )
         
         if tp_hit:
             self.logger.info(
@@ -520,23 +610,23 @@ class BacktestEngine:
             return
         
         # Check stop loss (para quantidade restante)
-        if trade.side == 'BUY' and low <= float(trade.stop_loss):
+        if trade.side == 'BUY' and low <= trade.stop_loss_f:
             exit_price = trade.stop_loss
             self._close_trade(symbol, exit_price, time, 'STOP_LOSS')
             return
         
-        if trade.side == 'SELL' and high >= float(trade.stop_loss):
+        if trade.side == 'SELL' and high >= trade.stop_loss_f:
             exit_price = trade.stop_loss
             self._close_trade(symbol, exit_price, time, 'STOP_LOSS')
             return
         
         # Check take profit
-        if trade.side == 'BUY' and high >= float(trade.take_profit):
+        if trade.side == 'BUY' and high >= trade.take_profit_f:
             exit_price = trade.take_profit
             self._close_trade(symbol, exit_price, time, 'TAKE_PROFIT')
             return
         
-        if trade.side == 'SELL' and low <= float(trade.take_profit):
+        if trade.side == 'SELL' and low <= trade.take_profit_f:
             exit_price = trade.take_profit
             self._close_trade(symbol, exit_price, time, 'TAKE_PROFIT')
             return
@@ -553,11 +643,7 @@ class BacktestEngine:
         trade = self.open_trades.pop(symbol)
         
         # ✅ SINCRONIZAÇÃO: Aplicar slippage IGUAL ao testnet
-        slippage = exit_price * self.settings.SLIPPAGE_PERCENT
-        if trade.side == 'BUY':
-            exit_price -= slippage
-        else:
-            exit_price += slippage
+        exit_price = exit_price * self._exit_slippage_mult[trade.side]
         
         # Close trade
         trade.close(
@@ -587,17 +673,16 @@ class BacktestEngine:
         """Calculate current total equity including open positions"""
         
         equity = self.capital
+        if not self.open_trades:
+            return equity
         
+        price = Decimal(str(current_price))
         for trade in self.open_trades.values():
             # Calculate unrealized PnL
             if trade.side == 'BUY':
-                unrealized_pnl = (
-                    Decimal(str(current_price)) - trade.entry_price
-                ) * trade.quantity
+                unrealized_pnl = (price - trade.entry_price) * trade.quantity
             else:
-                unrealized_pnl = (
-                    trade.entry_price - Decimal(str(current_price))
-                ) * trade.quantity
+                unrealized_pnl = (trade.entry_price - price) * trade.quantity
             
             equity += unrealized_pnl
         
@@ -622,29 +707,28 @@ class BacktestEngine:
             self.settings.BACKTEST_INITIAL_CAPITAL * 100
         )
         
-        wins = [float(t.pnl) for t in self.trades if t.pnl > 0]
-        losses = [float(t.pnl) for t in self.trades if t.pnl < 0]
+        # PnL por trade como array: wins/losses por máscara em vez de listas
+        pnls = np.array([float(t.pnl) for t in self.trades], dtype=np.float64)
+        wins = pnls[pnls > 0]
+        losses = pnls[pnls < 0]
         
-        avg_win = np.mean(wins) if wins else 0
-        avg_loss = np.mean(losses) if losses else 0
-        largest_win = max(wins) if wins else 0
-        largest_loss = min(losses) if losses else 0
+        avg_win = float(np.mean(wins)) if wins.size else 0
+        avg_loss = float(np.mean(losses)) if losses.size else 0
+        largest_win = float(wins.max()) if wins.size else 0
+        largest_loss = float(losses.min()) if losses.size else 0
         
         # Profit factor
-        total_wins = sum(wins) if wins else 0
-        total_losses = abs(sum(losses)) if losses else 0
+        total_wins = float(wins.sum()) if wins.size else 0
+        total_losses = abs(float(losses.sum())) if losses.size else 0
         profit_factor = (total_wins / total_losses) if total_losses > 0 else 0
         
-        # Risk metrics
-        returns = [
-            float((self.equity_curve[i] - self.equity_curve[i-1]) / self.equity_curve[i-1])
-            for i in range(1, len(self.equity_curve))
-        ]
+        # Risk metrics (retornos por candle vetorizados sobre a curva em float)
+        equity = np.array([float(e) for e in self.equity_curve], dtype=np.float64)
+        returns = (np.diff(equity) / equity[:-1]).tolist()
         
-        sharpe = calculate_sharpe_ratio(returns)
-        sortino = calculate_sortino_ratio(returns)
+        sharpe, sortino = calculate_risk_ratios(returns)
         
-        equity_values = [float(e) for e in self.equity_curve]
+        equity_values = equity.tolist()
         max_dd, peak_idx, trough_idx = calculate_max_drawdown(equity_values)
         
         results = {
@@ -762,8 +846,17 @@ class BacktestEngine:
         
         report_path = self.settings.REPORTS_DIR / 'backtest_results.json'
         
-        with open(report_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        # orjson serializa direto para bytes (numpy incluso) numa única escrita
+        if orjson is not None:
+            report_path.write_bytes(
+                orjson.dumps(
+                    results,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                )
+            )
+        else:
+            with open(report_path, 'w') as f:
+                json.dump(results, f, indent=2)
         
         self.logger.info(f"  JSON report saved: {report_path}")
     
@@ -9,13 +9,30 @@ from decimal import Decimal
 from datetime import datetime, timedelta
 import time
 import pandas as pd
+import requests
 from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 from core.utils import (
     retry_with_backoff, RateLimiter, round_down,
-    format_quantity, format_price, validate_symbol_filters
+    format_quantity, format_price, validate_symbol_filters, _INTERVAL_SEC
 )
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+# Timeout HTTP das ordens (vale em qualquer thread, ao contrário de SIGALRM)
+_ORDER_TIMEOUT_SEC = 30
+
+
+def _orjson_response_hook(response, *args, **kwargs):
+    """requests hook: response.json() decodes with orjson (same dicts/lists, faster)"""
+    content = response.content
+    # orjson.JSONDecodeError é ValueError: o tratamento do python-binance continua valendo
+    response.json = lambda **_: orjson.loads(content)
+    return response
+
 
 class BinanceExchange:
     """Binance exchange API wrapper with error handling"""
@@ -45,12 +62,19 @@ class BinanceExchange:
                 self.client = Client(api_key, api_secret)
                 self.logger.info("✅ Connected to Binance Live")
             
+            # ✅ Respostas REST (klines, ordens, tickers) decodificadas com orjson quando instalado
+            if orjson is not None:
+                self.client.session.hooks['response'].append(_orjson_response_hook)
+            
             # Rate limiter
             self.rate_limiter = RateLimiter(max_requests=1200, time_window=60)
             
             # Cache exchange info
             self._exchange_info = None
             self._symbol_info_cache = {}
+            self._filters_cache: Dict[str, Dict[str, Decimal]] = {}
+            self._ticker_snapshot: Optional[Tuple[float, Dict[str, Decimal]]] = None
+            self._balance_cache: Optional[Tuple[float, Decimal]] = None
             self._load_exchange_info()
             
         except Exception as e:
@@ -63,6 +87,7 @@ class BinanceExchange:
             self._exchange_info = self.get_exchange_info()
             
             # Cache symbol info for quick access
+            self._filters_cache.clear()
             for symbol_info in self._exchange_info['symbols']:
                 symbol = symbol_info['symbol']
                 self._symbol_info_cache[symbol] = symbol_info
@@ -106,6 +131,11 @@ class BinanceExchange:
         Returns:
             Dictionary with filter values
         """
+        # ✅ Filtros só mudam com o exchange info: parse uma vez por símbolo
+        cached = self._filters_cache.get(symbol)
+        if cached is not None:
+            return dict(cached)
+        
         symbol_info = self.get_symbol_info(symbol)
         
         if not symbol_info:
@@ -118,7 +148,7 @@ class BinanceExchange:
         price_filter = filters.get('PRICE_FILTER', {})
         min_notional = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL', {})
         
-        return {
+        parsed = {
             'stepSize': Decimal(str(lot_size.get('stepSize', '0.00000001'))),
             'minQty': Decimal(str(lot_size.get('minQty', '0.00000001'))),
             'maxQty': Decimal(str(lot_size.get('maxQty', '9000000000'))),
@@ -127,16 +157,23 @@ class BinanceExchange:
             'maxPrice': Decimal(str(price_filter.get('maxPrice', '1000000'))),
             'minNotional': Decimal(str(min_notional.get('minNotional', '10'))),
         }
+        self._filters_cache[symbol] = parsed
+        return dict(parsed)
     
     @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
-    def get_account(self) -> Dict[str, Any]:
+    def get_account(self, omit_zero_balances: bool = False) -> Dict[str, Any]:
         """
         Get account information
         
+        Args:
+            omit_zero_balances: Ask the API to drop assets with free + locked == 0
+            
         Returns:
             Account info dictionary
         """
         self.rate_limiter.wait_if_needed()
+        if omit_zero_balances:
+            return self.client.get_account(omitZeroBalances='true')
         return self.client.get_account()
     
     @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
@@ -166,7 +203,52 @@ class BinanceExchange:
         """
         self.rate_limiter.wait_if_needed()
         ticker = self.client.get_symbol_ticker(symbol=symbol)
-        return Decimal(str(ticker['price']))
+        return Decimal(ticker['price'])
+    
+    @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
+    def get_ticker_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        """
+        Get current prices for several symbols in one request
+        
+        Args:
+            symbols: Trading pair symbols
+            
+        Returns:
+            Dictionary symbol -> price as Decimal
+        """
+        if not symbols:
+            return {}
+        
+        self.rate_limiter.wait_if_needed()
+        # symbols=["A","B"] (array JSON, sem espaços) -> uma lista de tickers
+        tickers = self.client.get_symbol_ticker(
+            symbols='[' + ','.join(f'"{symbol}"' for symbol in symbols) + ']'
+        )
+        return {ticker['symbol']: Decimal(ticker['price']) for ticker in tickers}
+    
+    @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
+    def get_all_ticker_prices(self, max_age: float = 5.0) -> Dict[str, Decimal]:
+        """
+        Get current price for every symbol in a single request
+        
+        Args:
+            max_age: Reuse the last snapshot if it is younger than this (seconds)
+            
+        Returns:
+            Dictionary symbol -> price as Decimal
+        """
+        now = time.monotonic()
+        cached = self._ticker_snapshot
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1]
+        
+        self.rate_limiter.wait_if_needed()
+        prices = {
+            ticker['symbol']: Decimal(ticker['price'])
+            for ticker in self.client.get_all_tickers()
+        }
+        self._ticker_snapshot = (now, prices)
+        return prices
     
     @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
     def get_klines(
@@ -175,7 +257,8 @@ class BinanceExchange:
         interval: str,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
-        limit: int = 1000
+        limit: int = 1000,
+        min_candles: int = 20
     ) -> pd.DataFrame:
         """
         Get historical klines/candlestick data com validação robusta
@@ -186,6 +269,7 @@ class BinanceExchange:
             start_time: Start time
             end_time: End time
             limit: Number of klines to retrieve (max 1000)
+            min_candles: Minimum candles required (lower for incremental tails)
             
         Returns:
             DataFrame with OHLCV data
@@ -251,10 +335,10 @@ class BinanceExchange:
                 )
         
         # 🔴 VALIDAÇÃO 4: Verifica se tem candles suficientes após limpeza
-        if len(df) < 20:
+        if len(df) < min_candles:
             raise ValueError(
                 f"Insufficient kline data for {symbol} {interval}: "
-                f"only {len(df)} candles (minimum 20 required)"
+                f"only {len(df)} candles (minimum {min_candles} required)"
             )
         
         # 🔴 VALIDAÇÃO 5: Verifica se timestamps estão em ordem e sem gaps excessivos
@@ -285,8 +369,52 @@ class BinanceExchange:
         
         return result_df
     
+    def get_klines_since(
+        self,
+        symbol: str,
+        interval: str,
+        cached: pd.DataFrame,
+        limit: int = 500,
+        max_new: int = 100
+    ) -> pd.DataFrame:
+        """
+        Extend a cached klines frame with only the candles opened since its last row
+        
+        The last cached candle is re-fetched (it may have been in progress) and
+        replaced; the result keeps the most recent `limit` rows. Falls back to a
+        full get_klines when the tail does not reach the present.
+        
+        Args:
+            symbol: Trading pair symbol
+            interval: Kline interval
+            cached: Frame previously returned by get_klines (UTC naive index)
+            limit: Rows to keep (same as the original full request)
+            max_new: Maximum candles requested for the tail
+            
+        Returns:
+            DataFrame with OHLCV data
+        """
+        if cached.empty:
+            return self.get_klines(symbol, interval, limit=limit)
+        
+        last_open = cached.index[-1].tz_localize('UTC').to_pydatetime()
+        tail = self.get_klines(
+            symbol, interval, start_time=last_open, limit=max_new, min_candles=1
+        )
+        
+        # Cauda cheia: pode haver mais candles além dela (pausa longa) -> recarga completa
+        if len(tail) >= max_new:
+            return self.get_klines(symbol, interval, limit=limit)
+        
+        merged = pd.concat([cached[cached.index < tail.index[0]], tail])
+        return merged.iloc[-limit:]
+    
     def _interval_to_seconds(self, interval: str) -> int:
         """Converte interval string para segundos"""
+        seconds = _INTERVAL_SEC.get(interval)
+        if seconds is not None:
+            return seconds
+        
         multipliers = {
             'm': 60,
             'h': 3600,
@@ -330,8 +458,6 @@ class BinanceExchange:
             TimeoutError: Se ordem demora mais de 30s
             ValueError: Se validação falhar
         """
-        import signal
-        
         # Get symbol filters
         filters = self.get_symbol_filters(symbol)
         symbol_info = self.get_symbol_info(symbol)
@@ -381,62 +507,49 @@ class BinanceExchange:
         if not is_valid:
             raise ValueError(f"Order validation failed: {error_msg}")
         
-        # 🔴 CORREÇÃO: Adicionar timeout de 30 segundos
-        def timeout_handler(signum, frame):
-            raise TimeoutError(f"Order creation timeout after 30s for {symbol}")
+        # 🔴 CORREÇÃO: timeout de 30 segundos por requisição HTTP
+        # (SIGALRM só funciona na main thread; saídas parciais rodam no scan_executor)
+        params['requests_params'] = {'timeout': _ORDER_TIMEOUT_SEC}
         
         # Create order COM TIMEOUT
         self.rate_limiter.wait_if_needed()
         
         try:
-            # Configurar signal de timeout (Linux/Mac)
-            if hasattr(signal, 'SIGALRM'):
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(30)  # 30 segundos de timeout
-            
-            try:
-                if test or self.testnet:
-                    response = self.client.create_test_order(**params)
-                    
-                    if not response:
-                        response = {
-                            'symbol': symbol,
-                            'orderId': int(time.time() * 1000),
-                            'clientOrderId': f"test_{int(time.time() * 1000)}",
-                            'transactTime': int(time.time() * 1000),
-                            'price': params.get('price', '0'),
-                            'origQty': params['quantity'],
-                            'executedQty': params['quantity'] if order_type == 'MARKET' else '0',
-                            'status': 'FILLED' if order_type == 'MARKET' else 'NEW',
-                            'type': order_type,
-                            'side': side,
-                        }
-                else:
-                    response = self.client.create_order(**params)
-                
-                # Cancelar timeout se sucesso
-                if hasattr(signal, 'SIGALRM'):
-                    signal.alarm(0)
+            if test or self.testnet:
+                response = self.client.create_test_order(**params)
                 
-                self.logger.info(
-                    f"Order created: {side} {quantity_str} {symbol} @ "
-                    f"{params.get('price', 'MARKET')}"
-                )
-                
-                return response
-                
-            except TimeoutError as e:
-                self.logger.error(f"🚨 ORDER TIMEOUT: {e}")
-                raise
+                if not response:
+                    response = {
+                        'symbol': symbol,
+                        'orderId': int(time.time() * 1000),
+                        'clientOrderId': f"test_{int(time.time() * 1000)}",
+                        'transactTime': int(time.time() * 1000),
+                        'price': params.get('price', '0'),
+                        'origQty': params['quantity'],
+                        'executedQty': params['quantity'] if order_type == 'MARKET' else '0',
+                        'status': 'FILLED' if order_type == 'MARKET' else 'NEW',
+                        'type': order_type,
+                        'side': side,
+                    }
+            else:
+                response = self.client.create_order(**params)
             
-            except BinanceAPIException as e:
-                self.logger.error(f"Order creation failed: {e}")
-                raise
-                
-        finally:
-            # Garantir que cancel timeout
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
+            self.logger.info(
+                f"Order created: {side} {quantity_str} {symbol} @ "
+                f"{params.get('price', 'MARKET')}"
+            )
+            
+            return response
+            
+        except requests.exceptions.Timeout as e:
+            self.logger.error(f"🚨 ORDER TIMEOUT: {symbol} after {_ORDER_TIMEOUT_SEC}s")
+            raise TimeoutError(
+                f"Order creation timeout after {_ORDER_TIMEOUT_SEC}s for {symbol}"
+            ) from e
+        
+        except BinanceAPIException as e:
+            self.logger.error(f"Order creation failed: {e}")
+            raise
     
     @retry_with_backoff(max_retries=3, exceptions=(BinanceRequestException,))
     def cancel_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
@@ -579,15 +692,27 @@ class BinanceExchange:
         
         return commission
     
-    def get_total_balance_usdt(self) -> Decimal:
+    def get_total_balance_usdt(
+        self,
+        max_age_s: float = 30.0,
+        prices: Optional[Dict[str, Decimal]] = None
+    ) -> Decimal:
         """
         Get total account balance in USDT
         
+        Args:
+            max_age_s: Reuse the last computed total if younger than this (seconds)
+            prices: Preloaded all-tickers snapshot (skips the ticker request)
+            
         Returns:
             Total balance in USDT
         """
+        cached = self._balance_cache
+        if cached is not None and time.monotonic() - cached[0] < max_age_s:
+            return cached[1]
+        
         try:
-            account = self.get_account()
+            account = self.get_account(omit_zero_balances=True)
             total_usdt = Decimal('0')
             
             for balance in account['balances']:
@@ -600,21 +725,28 @@ class BinanceExchange:
                     if asset == 'USDT':
                         total_usdt += total
                     else:
-                        # Try to get USD value
+                        # Try to get USD value (1 snapshot para todos os ativos)
                         try:
-                            symbol = f"{asset}USDT"
-                            price = self.get_ticker_price(symbol)
-                            total_usdt += total * price
-                        except:
+                            if prices is None:
+                                prices = self.get_all_ticker_prices()
+                            price = prices.get(f"{asset}USDT")
+                            if price is not None:
+                                total_usdt += total * price
                             # Skip assets without USDT pair
+                        except:
                             pass
             
+            self._balance_cache = (time.monotonic(), total_usdt)
             return total_usdt
             
         except Exception as e:
             self.logger.error(f"Failed to calculate total balance: {e}")
             return Decimal('0')
     
+    def invalidate_balance_cache(self) -> None:
+        """Force the next get_total_balance_usdt call to hit the API"""
+        self._balance_cache = None
+    
     def ping(self) -> bool:
         """
         Test connectivity to the API
@@ -0,0 +1,172 @@
+"""
+Numba kernels for strategy indicators
+Optional: when numba is not installed the strategies keep using the ta/pandas pipeline
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende do ambiente
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op decorator used when numba is missing"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def _ewm_step(prev: float, value: float, alpha: float) -> float:
+    """One adjust=False EWM step, same arithmetic as pandas' ewma"""
+    if prev == value:
+        return prev
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * value) / (old_wt + alpha)
+
+
+@njit(cache=True)
+def fused_close_indicators(
+    close: np.ndarray,
+    bb_n: int,
+    bb_std: float,
+    rsi_n: int,
+    ema_fast_n: int,
+    ema_slow_n: int,
+    ema_trend_n: int,
+    macd_sig_n: int
+) -> Tuple[np.ndarray, ...]:
+    """
+    Compute every close-only indicator in a single pass over `close`
+
+    Matches ta's BollingerBands (ddof=0), RSIIndicator (Wilder),
+    EMAIndicator and MACD with fillna=False (NaN during warmup).
+
+    Returns:
+        (bb_mavg, bb_mstd, rsi, ema_fast, ema_slow, ema_trend, macd, macd_signal)
+    """
+    n = close.shape[0]
+    bb_mavg = np.full(n, np.nan)
+    bb_mstd = np.full(n, np.nan)
+    rsi = np.full(n, np.nan)
+    ema_fast = np.full(n, np.nan)
+    ema_slow = np.full(n, np.nan)
+    ema_trend = np.full(n, np.nan)
+    macd = np.full(n, np.nan)
+    macd_signal = np.full(n, np.nan)
+
+    if n == 0:
+        return bb_mavg, bb_mstd, rsi, ema_fast, ema_slow, ema_trend, macd, macd_signal
+
+    a_fast = 2.0 / (ema_fast_n + 1.0)
+    a_slow = 2.0 / (ema_slow_n + 1.0)
+    a_trend = 2.0 / (ema_trend_n + 1.0)
+    a_sig = 2.0 / (macd_sig_n + 1.0)
+    a_rsi = 1.0 / rsi_n
+
+    # Estado dos acumuladores (primeira observação semeia as EMAs)
+    e_fast = close[0]
+    e_slow = close[0]
+    e_trend = close[0]
+    up = 0.0
+    dn = 0.0
+    sig = 0.0
+    sig_count = 0
+
+    for i in range(n):
+        c = close[i]
+
+        if i > 0:
+            e_fast = _ewm_step(e_fast, c, a_fast)
+            e_slow = _ewm_step(e_slow, c, a_slow)
+            e_trend = _ewm_step(e_trend, c, a_trend)
+
+            diff = c - close[i - 1]
+            up = _ewm_step(up, diff if diff > 0 else 0.0, a_rsi)
+            dn = _ewm_step(dn, -diff if diff < 0 else 0.0, a_rsi)
+
+        if i >= ema_fast_n - 1:
+            ema_fast[i] = e_fast
+        if i >= ema_slow_n - 1:
+            ema_slow[i] = e_slow
+        if i >= ema_trend_n - 1:
+            ema_trend[i] = e_trend
+
+        # MACD = ema_fast - ema_slow; sinal é EMA do MACD a partir do 1º valor válido
+        if i >= ema_fast_n - 1 and i >= ema_slow_n - 1:
+            m = e_fast - e_slow
+            macd[i] = m
+            if sig_count == 0:
+                sig = m
+            else:
+                sig = _ewm_step(sig, m, a_sig)
+            sig_count += 1
+            if sig_count >= macd_sig_n:
+                macd_signal[i] = sig
+
+        if i >= rsi_n - 1:
+            if dn == 0.0:
+                rsi[i] = 100.0
+            else:
+                rsi[i] = 100.0 - 100.0 / (1.0 + up / dn)
+
+        # Bollinger: janela curta, recalculada em cache a cada barra
+        if i >= bb_n - 1:
+            total = 0.0
+            for j in range(i - bb_n + 1, i + 1):
+                total += close[j]
+            mean = total / bb_n
+            var = 0.0
+            for j in range(i - bb_n + 1, i + 1):
+                d = close[j] - mean
+                var += d * d
+            bb_mavg[i] = mean
+            bb_mstd[i] = math.sqrt(var / bb_n)
+
+    return bb_mavg, bb_mstd, rsi, ema_fast, ema_slow, ema_trend, macd, macd_signal
+
+
+@njit(cache=True)
+def _wilder_recursion_nb(true_range: np.ndarray, window: int, seed: float) -> np.ndarray:
+    """ta's ATR recursion: zeros during warmup, seed at window-1, then Wilder smoothing"""
+    n = true_range.shape[0]
+    atr = np.zeros(n)
+    if n < window:
+        return atr
+    atr[window - 1] = seed
+    for i in range(window, n):
+        atr[i] = (atr[i - 1] * (window - 1) + true_range[i]) / window
+    return atr
+
+
+def atr_nb(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    """
+    Average True Range matching ta's AverageTrueRange (fillna=False)
+    
+    The true range and the seed mean stay in NumPy (same summation as
+    pandas' mean), only the per-bar recursion runs in the kernel.
+    """
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    # fmax ignora o NaN do primeiro candle, como o max(axis=1) do pandas
+    true_range = np.fmax(
+        high - low,
+        np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+    seed = float(np.mean(true_range[:window])) if true_range.shape[0] >= window else 0.0
+    return _wilder_recursion_nb(true_range, window, seed)
+
+
+def warmup() -> None:
+    """Compile (or load from cache) the kernels so the first scan doesn't pay the JIT"""
+    if not NUMBA_AVAILABLE:
+        return
+    sample = np.linspace(100.0, 101.0, 64)
+    fused_close_indicators(sample, 20, 2.0, 14, 12, 26, 50, 9)
+    atr_nb(sample + 0.5, sample - 0.5, sample, 14)
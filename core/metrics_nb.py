@@ -0,0 +1,37 @@
+"""
+Numba kernel for backtest report metrics
+Optional: without numba core.utils keeps the vectorized NumPy version
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from core.indicators_nb import njit
+
+
+@njit(cache=True)
+def max_drawdown_nb(equity: np.ndarray) -> Tuple[float, int, int]:
+    """
+    Single pass max drawdown with the same tie-breaking as the NumPy version
+    (first peak reaching the running max, first trough of the deepest drawdown)
+    
+    Returns:
+        (max_drawdown_fraction, peak_idx, trough_idx)
+    """
+    peak = equity[0]
+    peak_i = 0
+    mdd = 0.0
+    peak_at_trough = 0
+    trough = 0
+    for i in range(equity.shape[0]):
+        value = equity[i]
+        if value > peak:
+            peak = value
+            peak_i = i
+        dd = (value - peak) / peak
+        if dd < mdd:
+            mdd = dd
+            trough = i
+            peak_at_trough = peak_i
+    return -mdd, peak_at_trough, trough
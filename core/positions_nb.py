@@ -0,0 +1,110 @@
+"""
+Numba kernel for the open-trade take profit / stop loss check
+Optional: without numba the same check runs as vectorized NumPy masks
+"""
+
+import numpy as np
+
+from core.indicators_nb import NUMBA_AVAILABLE, njit
+
+# Bits do código de evento por trade (combináveis)
+EXIT_NONE = 0
+EXIT_STOP_LOSS = 1
+EXIT_TAKE_PROFIT = 2
+EVENT_PARTIAL_TP = 4
+
+# Bits de tp_flags (níveis já executados)
+TP1_FLAG = 1
+TP2_FLAG = 2
+TP3_FLAG = 4
+
+
+@njit(cache=True)
+def _evaluate_levels_nb(
+    prices: np.ndarray,
+    sides: np.ndarray,
+    stops: np.ndarray,
+    tp1: np.ndarray,
+    tp2: np.ndarray,
+    tp3: np.ndarray,
+    tp_flags: np.ndarray
+) -> np.ndarray:
+    """Event bits per trade in a single pass (fixed-point int64 inputs)"""
+    n = prices.shape[0]
+    events = np.zeros(n, dtype=np.uint8)
+    for i in range(n):
+        side = sides[i]
+        price = prices[i]
+        if side == 0 or price == 0:
+            continue
+
+        flags = tp_flags[i]
+        if (flags & TP3_FLAG) == 0:
+            if (flags & TP1_FLAG) == 0:
+                next_tp = tp1[i]
+            elif (flags & TP2_FLAG) == 0:
+                next_tp = tp2[i]
+            else:
+                next_tp = tp3[i]
+            if side * (price - next_tp) >= 0:
+                events[i] |= EVENT_PARTIAL_TP
+
+        # SL tem prioridade sobre TP
+        if side * (price - stops[i]) <= 0:
+            events[i] |= EXIT_STOP_LOSS
+        elif side * (price - tp3[i]) >= 0:
+            events[i] |= EXIT_TAKE_PROFIT
+    return events
+
+
+def _evaluate_levels_np(
+    prices: np.ndarray,
+    sides: np.ndarray,
+    stops: np.ndarray,
+    tp1: np.ndarray,
+    tp2: np.ndarray,
+    tp3: np.ndarray,
+    tp_flags: np.ndarray
+) -> np.ndarray:
+    """NumPy fallback with the same semantics as _evaluate_levels_nb"""
+    active = (sides != 0) & (prices != 0)
+    next_tp = np.where(
+        (tp_flags & TP1_FLAG) == 0, tp1,
+        np.where((tp_flags & TP2_FLAG) == 0, tp2, tp3)
+    )
+    partial = active & ((tp_flags & TP3_FLAG) == 0) & (sides * (prices - next_tp) >= 0)
+    sl_hit = active & (sides * (prices - stops) <= 0)
+    tp_hit = active & ~sl_hit & (sides * (prices - tp3) >= 0)
+
+    events = np.zeros(prices.shape[0], dtype=np.uint8)
+    events[partial] |= EVENT_PARTIAL_TP
+    events[sl_hit] |= EXIT_STOP_LOSS
+    events[tp_hit] |= EXIT_TAKE_PROFIT
+    return events
+
+
+def evaluate_levels(
+    prices: np.ndarray,
+    sides: np.ndarray,
+    stops: np.ndarray,
+    tp1: np.ndarray,
+    tp2: np.ndarray,
+    tp3: np.ndarray,
+    tp_flags: np.ndarray
+) -> np.ndarray:
+    """
+    Fused partial-TP / SL / TP check for all open trades
+
+    Args:
+        prices: Current prices (int64, fixed-point); 0 = no price
+        sides: +1 for BUY, -1 for SELL, 0 for an empty slot (int64)
+        stops: Stop loss levels (int64, fixed-point)
+        tp1, tp2, tp3: Take profit levels (int64, fixed-point)
+        tp_flags: TP1_FLAG/TP2_FLAG/TP3_FLAG bits already executed (uint8)
+
+    Returns:
+        uint8 array of EVENT_PARTIAL_TP | EXIT_STOP_LOSS / EXIT_TAKE_PROFIT bits
+    """
+    if NUMBA_AVAILABLE:
+        return _evaluate_levels_nb(prices, sides, stops, tp1, tp2, tp3, tp_flags)
+    return _evaluate_levels_np(prices, sides, stops, tp1, tp2, tp3, tp_flags)
@@ -383,7 +383,6 @@ class RiskManager:
         quantity = position_size_usd / entry_price
         
         # Round down to step size
-        from core.utils import round_down
         quantity = round_down(Decimal(str(quantity)), symbol_filters['stepSize'])
         
         # Check minimum quantity
@@ -4,11 +4,31 @@ Mean Reversion, Breakout, Trend Following, and Ensemble strategies
 """
 
 import logging
-from typing import Optional, Dict, Tuple
+import threading
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional, Dict, Tuple
 from decimal import Decimal
 import pandas as pd
 import numpy as np
 import ta
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.indicators_nb import NUMBA_AVAILABLE, atr_nb, fused_close_indicators
+
+# ✅ Força mínima (exclusiva) para executar BUY/SELL: única fonte para backtest, testnet e live
+SIGNAL_STRENGTH_THRESHOLD = 0.40
+
+
+def _donchian(high: np.ndarray, low: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rolling max(high) / min(low), NaN during warmup (same as pandas rolling)"""
+    n = high.shape[0]
+    upper = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    if n >= window:
+        # Janelas como views sobre os arrays contíguos: redução vetorizada, sem cópia
+        upper[window - 1:] = sliding_window_view(high, window).max(axis=1)
+        lower[window - 1:] = sliding_window_view(low, window).min(axis=1)
+    return upper, lower
 
 
 class BaseStrategy:
@@ -24,12 +44,13 @@ class BaseStrategy:
         self.name = name
         self.logger = logging.getLogger(f'TradingBot.Strategy.{name}')
     
-    def generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+    def generate_signal(self, df: pd.DataFrame, precomputed: bool = False) -> Tuple[str, float]:
         """
         Generate trading signal from data
         
         Args:
             df: DataFrame with OHLCV data and indicators
+            precomputed: df already went through add_indicators (skip recomputing)
             
         Returns:
             Tuple of (signal, strength) where signal is 'BUY', 'SELL', or 'HOLD'
@@ -91,17 +112,20 @@ class MeanReversionStrategy(BaseStrategy):
         
         return df
     
-    def generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+    def generate_signal(self, df: pd.DataFrame, precomputed: bool = False) -> Tuple[str, float]:
         if len(df) < self.bb_period:
             return 'HOLD', 0.0
 
-        df = self.add_indicators(df)
+        return self._signal_from_row(df if precomputed else self.add_indicators(df))
 
-        close = df['close'].iloc[-1]
-        prev_close = df['close'].iloc[-2]
-        bb_upper = df['bb_upper'].iloc[-1]
-        bb_lower = df['bb_lower'].iloc[-1]
-        rsi = df['rsi'].iloc[-1]
+    def _signal_from_row(self, df: pd.DataFrame) -> Tuple[str, float]:
+        """Evaluate signal from the last rows of an already enriched DataFrame"""
+        # ✅ Acesso posicional direto nos arrays NumPy (sem indexação do pandas)
+        close_arr = df['close'].to_numpy()
+        close, prev_close = close_arr[-1], close_arr[-2]
+        bb_upper = df['bb_upper'].to_numpy()[-1]
+        bb_lower = df['bb_lower'].to_numpy()[-1]
+        rsi = df['rsi'].to_numpy()[-1]
 
         if pd.isna(rsi) or pd.isna(bb_lower):
             return 'HOLD', 0.0
@@ -145,36 +169,44 @@ class BreakoutStrategy(BaseStrategy):
         df = df.copy()
         
         # Donchian Channels
-        df['dc_upper'] = df['high'].rolling(window=self.lookback_period).max()
-        df['dc_lower'] = df['low'].rolling(window=self.lookback_period).min()
-        df['dc_middle'] = (df['dc_upper'] + df['dc_lower']) / 2
+        dc_upper, dc_lower = _donchian(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            self.lookback_period
+        )
+        df['dc_upper'] = dc_upper
+        df['dc_lower'] = dc_lower
+        df['dc_middle'] = (dc_upper + dc_lower) / 2
         
         # Volume indicators
         df['volume_ma'] = df['volume'].rolling(window=20).mean()
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
-        # ATR for volatility
-        df['atr'] = ta.volatility.AverageTrueRange(
-            high=df['high'],
-            low=df['low'],
-            close=df['close'],
-            window=14
-        ).average_true_range()
+        # ATR for volatility (mesmo resultado do ta, recursão fora do pandas)
+        df['atr'] = atr_nb(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            14
+        )
         
         return df
     
-    def generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+    def generate_signal(self, df: pd.DataFrame, precomputed: bool = False) -> Tuple[str, float]:
         if len(df) < self.lookback_period + 2:
             return 'HOLD', 0.0
 
-        df = self.add_indicators(df)
+        return self._signal_from_row(df if precomputed else self.add_indicators(df))
 
-        close = df['close'].iloc[-1]
-        prev_close = df['close'].iloc[-2]
-        dc_upper = df['dc_upper'].iloc[-2]
-        dc_lower = df['dc_lower'].iloc[-2]
-        volume_ratio = df['volume_ratio'].iloc[-1]
-        atr = df['atr'].iloc[-1] if 'atr' in df.columns else np.nan
+    def _signal_from_row(self, df: pd.DataFrame) -> Tuple[str, float]:
+        """Evaluate signal from the last rows of an already enriched DataFrame"""
+        # ✅ Acesso posicional direto nos arrays NumPy (sem indexação do pandas)
+        close_arr = df['close'].to_numpy()
+        close, prev_close = close_arr[-1], close_arr[-2]
+        dc_upper = df['dc_upper'].to_numpy()[-2]
+        dc_lower = df['dc_lower'].to_numpy()[-2]
+        volume_ratio = df['volume_ratio'].to_numpy()[-1]
+        atr = df['atr'].to_numpy()[-1] if 'atr' in df.columns else np.nan
 
         if pd.isna(dc_upper) or pd.isna(volume_ratio):
             return 'HOLD', 0.0
@@ -253,17 +285,20 @@ class TrendFollowingStrategy(BaseStrategy):
         df['macd_diff'] = macd.macd_diff()
         
         # ADX for trend strength
-        adx = ta.trend.ADXIndicator(
+        df['adx'] = self.adx(df)
+        
+        return df
+    
+    def adx(self, df: pd.DataFrame) -> pd.Series:
+        """ADX (14) used as trend strength filter"""
+        return ta.trend.ADXIndicator(
             high=df['high'],
             low=df['low'],
             close=df['close'],
             window=14
-        )
-        df['adx'] = adx.adx()
-        
-        return df
+        ).adx()
     
-    def generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+    def generate_signal(self, df: pd.DataFrame, precomputed: bool = False) -> Tuple[str, float]:
         """
         Generate trend following signal
         
@@ -273,20 +308,24 @@ class TrendFollowingStrategy(BaseStrategy):
         if len(df) < self.trend_ema:
             return 'HOLD', 0.0
         
-        df = self.add_indicators(df)
-        
-        # Get latest values
-        close = df['close'].iloc[-1]
-        ema_fast = df['ema_fast'].iloc[-1]
-        ema_slow = df['ema_slow'].iloc[-1]
-        ema_trend = df['ema_trend'].iloc[-1]
-        macd = df['macd'].iloc[-1]
-        macd_signal = df['macd_signal'].iloc[-1]
-        adx = df['adx'].iloc[-1]
+        return self._signal_from_row(df if precomputed else self.add_indicators(df))
+    
+    def _signal_from_row(self, df: pd.DataFrame) -> Tuple[str, float]:
+        """Evaluate signal from the last rows of an already enriched DataFrame"""
+        # Get latest values (acesso posicional direto nos arrays NumPy)
+        ema_fast_arr = df['ema_fast'].to_numpy()
+        ema_slow_arr = df['ema_slow'].to_numpy()
+        close = df['close'].to_numpy()[-1]
+        ema_fast = ema_fast_arr[-1]
+        ema_slow = ema_slow_arr[-1]
+        ema_trend = df['ema_trend'].to_numpy()[-1]
+        macd = df['macd'].to_numpy()[-1]
+        macd_signal = df['macd_signal'].to_numpy()[-1]
+        adx = df['adx'].to_numpy()[-1]
         
         # Previous values
-        prev_ema_fast = df['ema_fast'].iloc[-2]
-        prev_ema_slow = df['ema_slow'].iloc[-2]
+        prev_ema_fast = ema_fast_arr[-2]
+        prev_ema_slow = ema_slow_arr[-2]
         
         if pd.isna(ema_fast) or pd.isna(adx):
             return 'HOLD', 0.0
@@ -344,39 +383,100 @@ class EnsembleStrategy(BaseStrategy):
         # Minimum bars needed: reduzido para não travar (antes era 200)
         self.min_bars = max(50, max(s.trend_ema if hasattr(s, 'trend_ema') else 0 for s in self.strategies.values()))
 
+        # ✅ Sub-estratégias e pesos fixados como atributos escalares (hot path sem dicts)
+        self._mr = self.strategies['mean_reversion']
+        self._bo = self.strategies['breakout']
+        self._tf = self.strategies['trend_following']
+        self._w_mr = self.weights['mean_reversion']
+        self._w_bo = self.weights['breakout']
+        self._w_tf = self.weights['trend_following']
+
     
     def add_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Add all indicators from sub-strategies"""
-        df = df.copy()
+        return self._precompute_shared(df)
+    
+    def _precompute_shared(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute the indicators shared by the sub-strategies
+        
+        With numba, every close-only indicator (BB, RSI, EMAs, MACD) comes
+        from one fused pass over `close`; otherwise uses the ta pipeline.
+        """
+        if not NUMBA_AVAILABLE:
+            df = df.copy()
+            for strategy in self.strategies.values():
+                df = strategy.add_indicators(df)
+            return df
+        
+        mr, tf = self._mr, self._tf
+        (bb_mavg, bb_mstd, rsi, ema_fast, ema_slow,
+         ema_trend, macd, macd_signal) = fused_close_indicators(
+            df['close'].to_numpy(dtype=np.float64),
+            mr.bb_period, float(mr.bb_std), mr.rsi_period,
+            tf.fast_ema, tf.slow_ema, tf.trend_ema, tf.signal_ema
+        )
         
-        for strategy in self.strategies.values():
-            df = strategy.add_indicators(df)
+        # Donchian/volume/ATR dependem de high/low/volume (já copia o df)
+        df = self._bo.add_indicators(df)
+        
+        bb_upper = bb_mavg + mr.bb_std * bb_mstd
+        bb_lower = bb_mavg - mr.bb_std * bb_mstd
+        df['bb_upper'] = bb_upper
+        df['bb_middle'] = bb_mavg
+        df['bb_lower'] = bb_lower
+        df['bb_width'] = (bb_upper - bb_lower) / bb_mavg * 100
+        df['rsi'] = rsi
+        df['ema_fast'] = ema_fast
+        df['ema_slow'] = ema_slow
+        df['ema_trend'] = ema_trend
+        df['macd'] = macd
+        df['macd_signal'] = macd_signal
+        df['macd_diff'] = macd - macd_signal
+        df['adx'] = tf.adx(df)
         
         return df
     
-    def generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+    def generate_signal(self, df: pd.DataFrame, precomputed: bool = False) -> Tuple[str, float]:
         if len(df) < self.min_bars:
             return 'HOLD', 0.0
 
-        signals = {}
-        for name, strategy in self.strategies.items():
-            signal, strength = strategy.generate_signal(df)
-            signals[name] = (signal, strength)
-            self.logger.debug(f"{name}: {signal} ({strength:.2f})")
+        # Indicadores calculados uma única vez para as 3 sub-estratégias
+        if not precomputed:
+            df = self._precompute_shared(df)
+
+        mr_sig, mr_str = self._mr._signal_from_row(df)
+        bo_sig, bo_str = self._bo._signal_from_row(df)
+        tf_sig, tf_str = self._tf._signal_from_row(df)
+        self.logger.debug(f"mean_reversion: {mr_sig} ({mr_str:.2f})")
+        self.logger.debug(f"breakout: {bo_sig} ({bo_str:.2f})")
+        self.logger.debug(f"trend_following: {tf_sig} ({tf_str:.2f})")
 
         buy_score = 0.0
         sell_score = 0.0
-        votes = {'buy': 0, 'sell': 0}
-
-        for name, (signal, strength) in signals.items():
-            weight = self.weights[name]
-            weighted_strength = strength * weight
-            if signal == 'BUY':
-                buy_score += weighted_strength
-                votes['buy'] += 1
-            elif signal == 'SELL':
-                sell_score += weighted_strength
-                votes['sell'] += 1
+        buy_votes = 0
+        sell_votes = 0
+
+        if mr_sig == 'BUY':
+            buy_score += mr_str * self._w_mr
+            buy_votes += 1
+        elif mr_sig == 'SELL':
+            sell_score += mr_str * self._w_mr
+            sell_votes += 1
+
+        if bo_sig == 'BUY':
+            buy_score += bo_str * self._w_bo
+            buy_votes += 1
+        elif bo_sig == 'SELL':
+            sell_score += bo_str * self._w_bo
+            sell_votes += 1
+
+        if tf_sig == 'BUY':
+            buy_score += tf_str * self._w_tf
+            buy_votes += 1
+        elif tf_sig == 'SELL':
+            sell_score += tf_str * self._w_tf
+            sell_votes += 1
 
         self.logger.debug(f"Buy score: {buy_score:.3f}, Sell score: {sell_score:.3f}, Threshold: {self.threshold:.3f}, Low: {getattr(self,'threshold_low',None)}")
 
@@ -387,17 +487,16 @@ class EnsembleStrategy(BaseStrategy):
             return 'SELL', sell_score
 
         # regra 2: parcial se score >= threshold_low AND pelo menos 2 estratégias votaram a favor
-        if buy_score > sell_score and buy_score >= self.threshold_low and votes['buy'] >= 2:
+        if buy_score > sell_score and buy_score >= self.threshold_low and buy_votes >= 2:
             # devolve sinal com força reduzida para indicar entrada parcial
             return 'BUY', buy_score * 0.9
-        if sell_score > buy_score and sell_score >= self.threshold_low and votes['sell'] >= 2:
+        if sell_score > buy_score and sell_score >= self.threshold_low and sell_votes >= 2:
             return 'SELL', sell_score * 0.9
 
         # regra 3: se apenas uma estratégia forte (breakout forte), permitir se strength alta
         # pega caso em que breakout faz a diferença mas os outros estão HOLD
-        breakout_sig, breakout_str = signals.get('breakout', ('HOLD', 0.0))
-        if breakout_sig in ['BUY','SELL'] and breakout_str > 0.85:
-            return breakout_sig, breakout_str * self.weights.get('breakout', 0.4)
+        if bo_sig in ['BUY','SELL'] and bo_str > 0.85:
+            return bo_sig, bo_str * self._w_bo
 
         return 'HOLD', 0.0
 
@@ -406,6 +505,21 @@ class EnsembleStrategy(BaseStrategy):
 class StrategyFactory:
     """Factory for creating strategy instances"""
     
+    # ✅ Registro montado uma vez (antes era recriado a cada create_strategy)
+    _STRATEGIES: Mapping[str, Callable[..., BaseStrategy]] = MappingProxyType({
+        'mean_reversion': MeanReversionStrategy,
+        'breakout': BreakoutStrategy,
+        'trend_following': TrendFollowingStrategy,
+        'ensemble': EnsembleStrategy,
+        'ensemble_aggressive': lambda **kw: EnsembleStrategy(aggressive=True, **kw),
+        # NOVO: Ensemble Ultra com indicadores mais sensíveis
+        'ensemble_ultra': lambda **kw: EnsembleStrategy(
+            aggressive=True,
+            weights={'mean_reversion': 0.15, 'breakout': 0.6, 'trend_following': 0.25},
+            **kw
+        ),
+    })
+    
     @staticmethod
     def create_strategy(strategy_name: str, **kwargs) -> BaseStrategy:
         """
@@ -418,20 +532,7 @@ class StrategyFactory:
         Returns:
             Strategy instance
         """
-        strategies = {
-            'mean_reversion': MeanReversionStrategy,
-            'breakout': BreakoutStrategy,
-            'trend_following': TrendFollowingStrategy,
-            'ensemble': EnsembleStrategy,
-            'ensemble_aggressive': lambda **kw: EnsembleStrategy(aggressive=True, **kw),
-            # NOVO: Ensemble Ultra com indicadores mais sensíveis
-            'ensemble_ultra': lambda **kw: EnsembleStrategy(
-                aggressive=True,
-                weights={'mean_reversion': 0.15, 'breakout': 0.6, 'trend_following': 0.25},
-                **kw
-            ),
-        }
-        
+        strategies = StrategyFactory._STRATEGIES
         strategy_class = strategies.get(strategy_name.lower())
         
         if not strategy_class:
@@ -468,6 +569,12 @@ class MultiTimeframeAnalyzer:
         self.strategy = strategy
         self.require_alignment = require_alignment
         self.logger = logging.getLogger('TradingBot.MultiTimeframe')
+        
+        # ✅ Sinal por DataFrame: o cache de klines devolve o MESMO objeto até o
+        # candle fechar (ex.: primary 4h em scans de 1h), então o resultado é reaproveitado.
+        # Chave id(df) + referência ao df (o id não é reciclado enquanto está aqui).
+        self._signal_memo: Dict[int, Tuple[pd.DataFrame, Tuple[str, float]]] = {}
+        self._memo_lock = threading.Lock()
     
     def analyze(
         self,
@@ -482,8 +589,42 @@ class MultiTimeframeAnalyzer:
             entry_df: OHLCV data for entry timeframe
             
         Returns:
-            Tuple of (signal, strength, metadata)
+            Tuple of (signal, strength, metadata). For BUY/SELL, metadata['atr']
+            holds the entry-timeframe ATR so callers don't recompute it.
         """
+        signal, strength, metadata = self._analyze(primary_df, entry_df)
+        
+        # ✅ ATR calculado uma vez aqui e repassado para o sizing/stop do trade
+        if signal in ('BUY', 'SELL'):
+            metadata['atr'] = self.get_atr(entry_df)
+        
+        return signal, strength, metadata
+    
+    _SIGNAL_MEMO_SIZE = 64
+    
+    def _generate_signal(self, df: pd.DataFrame) -> Tuple[str, float]:
+        """strategy.generate_signal, memoized per DataFrame object (frames are never mutated)"""
+        key = id(df)
+        with self._memo_lock:
+            hit = self._signal_memo.get(key)
+        if hit is not None and hit[0] is df:
+            return hit[1]
+        
+        result = self.strategy.generate_signal(df)
+        
+        with self._memo_lock:
+            memo = self._signal_memo
+            memo[key] = (df, result)
+            if len(memo) > self._SIGNAL_MEMO_SIZE:
+                del memo[next(iter(memo))]
+        return result
+    
+    def _analyze(
+        self,
+        primary_df: pd.DataFrame,
+        entry_df: pd.DataFrame
+    ) -> Tuple[str, float, Dict[str, any]]:
+        """Signal/strength/metadata across timeframes (see analyze)"""
         # 🔴 VALIDAÇÃO: DataFrames válidos
         if primary_df.empty:
             self.logger.warning("Primary DataFrame is empty!")
@@ -508,28 +649,30 @@ class MultiTimeframeAnalyzer:
         
         # Get primary trend
         try:
-            primary_signal, primary_strength = self.strategy.generate_signal(primary_df)
+            primary_signal, primary_strength = self._generate_signal(primary_df)
         except Exception as e:
             self.logger.error(f"Error generating primary signal: {e}", exc_info=True)
             return 'HOLD', 0.0, {'reason': f'Primary signal error: {str(e)}'}
         
+        # ✅ Modo conservador sem tendência no primary: resultado já é HOLD,
+        # não precisa rodar a estratégia no entry timeframe
+        if self.require_alignment and primary_signal == 'HOLD':
+            return 'HOLD', 0.0, {
+                'primary_signal': primary_signal,
+                'entry_signal': 'N/A',
+                'reason': 'No primary trend'
+            }
+        
         # Get entry signal
         try:
-            entry_signal, entry_strength = self.strategy.generate_signal(entry_df)
+            entry_signal, entry_strength = self._generate_signal(entry_df)
         except Exception as e:
             self.logger.error(f"Error generating entry signal: {e}", exc_info=True)
             return 'HOLD', 0.0, {'reason': f'Entry signal error: {str(e)}'}
         
         # Modo CONSERVADOR (require_alignment = True)
         if self.require_alignment:
-            # Only take trades aligned with primary trend
-            if primary_signal == 'HOLD':
-                return 'HOLD', 0.0, {
-                    'primary_signal': primary_signal,
-                    'entry_signal': entry_signal,
-                    'reason': 'No primary trend'
-                }
-            
+            # Only take trades aligned with primary trend (primary HOLD já tratado acima)
             if entry_signal == primary_signal:
                 # Signals aligned - combine strengths
                 combined_strength = (primary_strength * 0.6 + entry_strength * 0.4)
@@ -613,14 +756,17 @@ class MultiTimeframeAnalyzer:
         Returns:
             ATR value as Decimal
         """
-        atr = ta.volatility.AverageTrueRange(
-            high=df['high'],
-            low=df['low'],
-            close=df['close'],
-            window=period
-        ).average_true_range()
+        if len(df) < period:
+            return Decimal('0')
+        
+        atr = atr_nb(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            period
+        )
         
-        if len(atr) > 0 and not pd.isna(atr.iloc[-1]):
-            return Decimal(str(atr.iloc[-1]))
+        if not np.isnan(atr[-1]):
+            return Decimal(str(atr[-1]))
         else:
             return Decimal('0')
\ No newline at end of file
@@ -1,23 +1,106 @@
 import logging
 import time
-import shutil
+import sqlite3
 from pathlib import Path
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Any, List, Dict, Mapping, Optional, Set, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
 import threading
-import pandas as pd
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import numpy as np
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
+from binance import ThreadedWebsocketManager
 from binance.exceptions import BinanceAPIException
 
+try:
+    import uvloop
+except ImportError:  # pragma: no cover - opcional
+    uvloop = None
+
 from core.exchange import BinanceExchange
+from core.indicators_nb import warmup as warmup_indicators
+from core.positions_nb import (
+    EVENT_PARTIAL_TP, EXIT_STOP_LOSS, EXIT_TAKE_PROFIT, TP1_FLAG, TP2_FLAG, evaluate_levels
+)
 from core.risk import RiskManager
-from core.strategy import StrategyFactory, MultiTimeframeAnalyzer
-from core.utils import notify, safe_decimal
+from core.strategy import StrategyFactory, MultiTimeframeAnalyzer, SIGNAL_STRENGTH_THRESHOLD
+from core.utils import notify, safe_decimal, to_fixed, from_fixed, PRICE_SCALE, _INTERVAL_SEC
 from db.models import (
     DatabaseManager, Trade, Order, Balance, Performance
 )
 
+if TYPE_CHECKING:  # só anotações: DataFrames chegam prontos de exchange/strategy
+    import pandas as pd
+
+
+# ✅ INSERTs Core sobre as Tables (não os mappers) construídos uma vez: o SQL
+# compilado fica no cache do engine, listas de dicts viram executemany e um
+# único dict devolve inserted_primary_key no mesmo round-trip do INSERT
+# (RETURNING implícito no Postgres/SQLite, cursor.lastrowid no MySQL; sem flush)
+_INSERT_TRADE = insert(Trade.__table__)
+_INSERT_ORDER = insert(Order.__table__)
+
+# Máximo de notificações pendentes; acima disso são descartadas (o loop nunca espera I/O)
+_NOTIFY_QUEUE_SIZE = 100
+_NOTIFY_LEVELS: Mapping[str, int] = MappingProxyType({'INFO': 0, 'WARNING': 1, 'ERROR': 2})
+
+# Templates das notificações de trade (formatados na thread notify, não no loop)
+_TRADE_OPEN_TMPL = (
+    "Order ID: {order_id}\n"
+    "Side: {side}\n"
+    "Entry: ${entry}\n"
+    "Quantity: {qty}\n"
+    "Stop Loss: ${sl}\n"
+    "Take Profit: ${tp}\n"
+    "Signal Strength: {strength:.2f}"
+)
+_TRADE_CLOSE_TMPL = (
+    "Side: {side}\n"
+    "Entry: ${entry}\n"
+    "Exit: ${exit} (com slippage)\n"
+    "Reason: {reason}\n"
+    "PnL: ${pnl:.2f} ({pnl_pct:+.2f}%)"
+)
+_TRADE_PARTIAL_CLOSE_TMPL = (
+    "Method: Partial Take Profits\n"
+    "Total PnL: ${pnl:.2f}\n"
+    "Return: {pnl_pct:+.2f}%"
+)
+
+# Candles mínimos no timeframe de entrada antes de analisar um símbolo
+_MIN_WARMUP_CANDLES = 200
+
+# Máximo de escritas de DB agrupadas em uma transação da thread db-writer
+_DB_BATCH_SIZE = 100
+
+
+def _new_stream_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop dedicado para um ThreadedWebsocketManager (uvloop se instalado)
+    
+    Sem loop explícito os managers reaproveitam o loop da thread principal,
+    e dois streams rodando nele ao mesmo tempo conflitam.
+    """
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+@dataclass
+class ScanResult:
+    """Resultado da análise de um símbolo (produzido pelas threads de scan)"""
+    symbol: str
+    signal: str
+    strength: float
+    entry_df: 'pd.DataFrame'
+    atr: Optional[Decimal] = None
+
 class BackupManager:
     """Gerencia backup automático de database"""
     
@@ -33,8 +116,51 @@ class BackupManager:
         self.backup_dir = Path('db/backups')
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         
+        # Backups existentes (mais antigo à esquerda): listados 1x, depois mantidos em memória
+        self._backups = deque(sorted(self.backup_dir.glob('db_backup_*.db')))
+        
+        # ✅ Backups periódicos numa thread dedicada (o loop só enfileira o pedido)
+        self._queue: queue.Queue = queue.Queue(maxsize=4)
+        self._worker = threading.Thread(
+            target=self._worker_loop,
+            name="backup",
+            daemon=True
+        )
+        self._worker.start()
+        
         self.logger.info(f"Backup manager initialized. Backup dir: {self.backup_dir}")
     
+    def request_backup(self) -> bool:
+        """
+        Enfileirar um backup para a thread de backup (não bloqueia)
+        
+        Returns:
+            False se já há pedidos demais na fila
+        """
+        try:
+            self._queue.put_nowait(True)
+            return True
+        except queue.Full:
+            self.logger.warning("Backup queue full, skipping request")
+            return False
+    
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Terminar os backups pendentes e encerrar a thread"""
+        if not self._worker.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._worker.join(timeout=timeout)
+    
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.backup()
+    
     def backup(self) -> bool:
         """
         Fazer backup do database
@@ -52,10 +178,21 @@ class BackupManager:
             backup_name = f"db_backup_{timestamp}.db"
             backup_path = self.backup_dir / backup_name
             
-            # Copiar arquivo
-            shutil.copy2(self.db_path, backup_path)
+            # API de backup do SQLite: cópia página a página, consistente mesmo
+            # com escritas concorrentes (sem lock de aplicação)
+            source = sqlite3.connect(str(self.db_path))
+            try:
+                target = sqlite3.connect(str(backup_path))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
             
             self.logger.info(f"✅ Backup criado: {backup_path}")
+            if not self._backups or self._backups[-1] != backup_path:
+                self._backups.append(backup_path)
             
             # Limpar backups antigos (manter apenas últimos 7)
             self._cleanup_old_backups()
@@ -74,14 +211,11 @@ class BackupManager:
             keep_count: Número de backups para manter
         """
         try:
-            backups = sorted(self.backup_dir.glob('db_backup_*.db'))
-            
-            if len(backups) > keep_count:
-                to_delete = backups[:-keep_count]
-                
-                for backup in to_delete:
-                    backup.unlink()
-                    self.logger.info(f"Deletado backup antigo: {backup.name}")
+            # Sem varrer o diretório: descarta pela esquerda da deque
+            while len(self._backups) > keep_count:
+                backup = self._backups.popleft()
+                backup.unlink(missing_ok=True)
+                self.logger.info(f"Deletado backup antigo: {backup.name}")
                     
         except Exception as e:
             self.logger.error(f"Erro ao limpar backups antigos: {e}")
@@ -90,6 +224,15 @@ class BackupManager:
 class TestnetTrade:
     """Representa uma posição aberta no testnet com suporte a partial TP (igual backtest)"""
     
+    # Frações dos níveis/quantidades de TP (constantes: evita parse de Decimal por trade)
+    _HALF = Decimal('0.5')
+    _THREE_QUARTERS = Decimal('0.75')
+    _TP1_FRAC = Decimal('0.3')
+    _TP2_FRAC = Decimal('0.4')
+    _DUST_QTY = Decimal('0.0001')
+    _ZERO = Decimal('0')
+    _TP_LEVELS = ('TP1', 'TP2', 'TP3')
+    
     def __init__(
         self,
         symbol: str,
@@ -113,23 +256,42 @@ class TestnetTrade:
         # Take Profit Parcial (3 níveis) - IGUAL AO BACKTEST
         distance = abs(take_profit - entry_price)
         if side == 'BUY':
-            self.tp1 = entry_price + (distance * Decimal('0.5'))   # 50% do caminho
-            self.tp2 = entry_price + (distance * Decimal('0.75'))  # 75% do caminho
+            self.tp1 = entry_price + (distance * self._HALF)   # 50% do caminho
+            self.tp2 = entry_price + (distance * self._THREE_QUARTERS)  # 75% do caminho
             self.tp3 = take_profit  # 100%
         else:  # SELL
-            self.tp1 = entry_price - (distance * Decimal('0.5'))
-            self.tp2 = entry_price - (distance * Decimal('0.75'))
+            self.tp1 = entry_price - (distance * self._HALF)
+            self.tp2 = entry_price - (distance * self._THREE_QUARTERS)
             self.tp3 = take_profit
         
+        # Quantidades dos fechamentos parciais (30% / 40% da posição inicial)
+        self._tp_qty1 = quantity * self._TP1_FRAC
+        self._tp_qty2 = quantity * self._TP2_FRAC
+        
         self.tp1_hit = False
         self.tp2_hit = False
         self.tp3_hit = False
         
+        # Lado da ordem de saída (fixo por trade)
+        self.exit_side = 'SELL' if side == 'BUY' else 'BUY'
+        
+        # PK da linha OPEN em `trades` (preenchida pela thread db-writer após o INSERT)
+        self.db_trade_id: Optional[int] = None
+        
+        # ✅ Níveis em ponto fixo (inteiros): checagem por tick sem aritmética Decimal
+        self._sign = 1 if side == 'BUY' else -1
+        self._entry_i = to_fixed(entry_price)
+        self._tp_i = (to_fixed(self.tp1), to_fixed(self.tp2), to_fixed(self.tp3))
+        # Próximo nível pendente (0 = TP1, 1 = TP2, 2 = TP3) e seu limiar; avançam a cada TP
+        self._tp_level = 0
+        self._next_tp_i = self._tp_i[0]
+        self._sl_i = to_fixed(stop_loss)
+        
         self.exit_price: Optional[Decimal] = None
         self.exit_time: Optional[datetime] = None
-        self.pnl: Decimal = Decimal('0')
+        self.pnl: Decimal = self._ZERO
         self.pnl_percent: float = 0.0
-        self.fees: Decimal = Decimal('0')
+        self.fees: Decimal = self._ZERO
         self.status: str = 'OPEN'
         self.exit_reason: str = ''
         self.partial_exits: List[Dict] = []
@@ -138,54 +300,56 @@ class TestnetTrade:
         self,
         current_price: Decimal,
         current_time: datetime,
-        fee_rate: Decimal
+        fee_rate: Decimal,
+        price_i: Optional[int] = None,
+        fee_i: Optional[int] = None
     ) -> Optional[str]:
         """
         Verifica e executa take profits parciais
         Retorna: 'TP1', 'TP2', 'TP3', ou None
         EXATAMENTE IGUAL AO BACKTEST
+        
+        price_i: current_price já em ponto fixo (evita reconverter)
+        fee_i: fee_rate já em ponto fixo
         """
-        if self.quantity <= 0:
+        if self.tp3_hit or self.quantity <= 0:
             return None
         
-        hit_tp = None
-        quantity_to_close = Decimal('0')
-        
-        # Check TP1 (30% position)
-        if not self.tp1_hit:
-            if (self.side == 'BUY' and current_price >= self.tp1) or \
-               (self.side == 'SELL' and current_price <= self.tp1):
-                self.tp1_hit = True
-                quantity_to_close = self.initial_quantity * Decimal('0.3')
-                hit_tp = 'TP1'
-        
-        # Check TP2 (40% position)
-        elif not self.tp2_hit:
-            if (self.side == 'BUY' and current_price >= self.tp2) or \
-               (self.side == 'SELL' and current_price <= self.tp2):
-                self.tp2_hit = True
-                quantity_to_close = self.initial_quantity * Decimal('0.4')
-                hit_tp = 'TP2'
-        
-        # Check TP3 (30% remaining)
-        elif not self.tp3_hit:
-            if (self.side == 'BUY' and current_price >= self.tp3) or \
-               (self.side == 'SELL' and current_price <= self.tp3):
-                self.tp3_hit = True
-                quantity_to_close = self.quantity  # Resto
-                hit_tp = 'TP3'
-        
-        if hit_tp and quantity_to_close > 0:
-            # Calculate partial PnL
-            if self.side == 'BUY':
-                partial_pnl = (current_price - self.entry_price) * quantity_to_close
-            else:
-                partial_pnl = (self.entry_price - current_price) * quantity_to_close
-            
-            # Calculate partial fees
-            entry_value = self.entry_price * quantity_to_close
-            exit_value = current_price * quantity_to_close
-            partial_fees = (entry_value + exit_value) * fee_rate
+        if price_i is None:
+            price_i = to_fixed(current_price)
+        sign = self._sign
+        
+        # Caminho comum (nível não atingido): só uma comparação inteira com o limiar
+        # pré-calculado, sem escolher nível nem tocar em Decimal
+        if sign * (price_i - self._next_tp_i) < 0:
+            return None
+        
+        # Nível pendente: 0 = TP1 (30%), 1 = TP2 (40%), 2 = TP3 (resto)
+        level = self._tp_level
+        if level < 2:
+            self._tp_level = level + 1
+            self._next_tp_i = self._tp_i[level + 1]
+        
+        if level == 0:
+            self.tp1_hit = True
+            quantity_to_close = self._tp_qty1
+        elif level == 1:
+            self.tp2_hit = True
+            quantity_to_close = self._tp_qty2
+        else:
+            self.tp3_hit = True
+            quantity_to_close = self.quantity  # Resto
+        hit_tp = self._TP_LEVELS[level]
+        
+        if quantity_to_close > 0:
+            # Calculate partial PnL / fees em inteiros; Decimal só no resultado
+            qty_i = to_fixed(quantity_to_close)
+            if fee_i is None:
+                fee_i = to_fixed(fee_rate)
+            partial_pnl = from_fixed(sign * (price_i - self._entry_i) * qty_i, PRICE_SCALE ** 2)
+            partial_fees = from_fixed(
+                (self._entry_i + price_i) * qty_i * fee_i, PRICE_SCALE ** 3
+            )
             
             # Net partial PnL
             partial_pnl -= partial_fees
@@ -205,7 +369,7 @@ class TestnetTrade:
             })
             
             # If all closed, mark as complete
-            if self.quantity <= Decimal('0.0001'):
+            if self.quantity <= self._DUST_QTY:
                 self.status = 'CLOSED'
                 self.exit_price = current_price
                 self.exit_time = current_time
@@ -224,7 +388,8 @@ class TestnetTrade:
         exit_price: Decimal,
         exit_time: datetime,
         reason: str,
-        fee_rate: Decimal
+        fee_rate: Decimal,
+        fee_i: Optional[int] = None
     ) -> None:
         """Fecha posição restante (stop loss ou saída manual)"""
         if self.quantity <= 0:
@@ -235,16 +400,18 @@ class TestnetTrade:
         self.exit_reason = reason
         self.status = 'CLOSED'
         
-        # Calculate PnL for remaining quantity
-        if self.side == 'BUY':
-            remaining_pnl = (exit_price - self.entry_price) * self.quantity
-        else:
-            remaining_pnl = (self.entry_price - exit_price) * self.quantity
-        
-        # Calculate fees for remaining
-        entry_value = self.entry_price * self.quantity
-        exit_value = exit_price * self.quantity
-        remaining_fees = (entry_value + exit_value) * fee_rate
+        # ✅ PnL/fees da quantidade restante em ponto fixo (inteiros); Decimal só no resultado
+        sign = self._sign
+        entry_i = self._entry_i
+        exit_i = to_fixed(exit_price)
+        qty_i = to_fixed(self.quantity)
+        if fee_i is None:
+            fee_i = to_fixed(fee_rate)
+        
+        remaining_pnl = from_fixed(sign * (exit_i - entry_i) * qty_i, PRICE_SCALE ** 2)
+        remaining_fees = from_fixed(
+            (entry_i + exit_i) * qty_i * fee_i, PRICE_SCALE ** 3
+        )
         
         # Add to totals
         self.pnl += remaining_pnl - remaining_fees
@@ -254,7 +421,143 @@ class TestnetTrade:
         total_entry_value = self.entry_price * self.initial_quantity
         self.pnl_percent = float((self.pnl / total_entry_value) * 100)
         
-        self.quantity = Decimal('0')
+        self.quantity = self._ZERO
+
+
+class OpenTradesTable:
+    """
+    Colunas NumPy (ponto fixo int64) com os níveis de SL/TP dos trades abertos
+    
+    Espelha open_trades (os objetos TestnetTrade continuam donos do PnL) para que
+    a checagem por tick leia memória contígua em vez de atributos por trade.
+    """
+    
+    def __init__(self, capacity: int = 16):
+        self.symbols: List[Optional[str]] = [None] * capacity
+        self.sym_to_idx: Dict[str, int] = {}
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self.side = np.zeros(capacity, dtype=np.int64)  # +1 BUY / -1 SELL / 0 livre
+        self.sl = np.zeros(capacity, dtype=np.int64)
+        self.tp1 = np.zeros(capacity, dtype=np.int64)
+        self.tp2 = np.zeros(capacity, dtype=np.int64)
+        self.tp3 = np.zeros(capacity, dtype=np.int64)
+        self.tp_flags = np.zeros(capacity, dtype=np.uint8)  # bit0=TP1, bit1=TP2, bit2=TP3
+    
+    def __len__(self) -> int:
+        return len(self.sym_to_idx)
+    
+    def _grow(self) -> None:
+        old = len(self.symbols)
+        new = old * 2
+        self.symbols.extend([None] * old)
+        self._free.extend(range(new - 1, old - 1, -1))
+        for name in ('side', 'sl', 'tp1', 'tp2', 'tp3', 'tp_flags'):
+            column = getattr(self, name)
+            grown = np.zeros(new, dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+    
+    def add_trade(self, trade: TestnetTrade) -> int:
+        """Insert (or replace) the row for trade.symbol; returns its slot"""
+        self.remove_trade(trade.symbol)
+        if not self._free:
+            self._grow()
+        
+        idx = self._free.pop()
+        self.symbols[idx] = trade.symbol
+        self.sym_to_idx[trade.symbol] = idx
+        self.side[idx] = trade._sign
+        self.sl[idx] = trade._sl_i
+        self.tp1[idx], self.tp2[idx], self.tp3[idx] = trade._tp_i
+        self.update_flags(trade)
+        return idx
+    
+    def update_flags(self, trade: TestnetTrade) -> None:
+        """Sync the TP-hit bits of trade's row after a partial exit"""
+        idx = self.sym_to_idx.get(trade.symbol)
+        if idx is not None:
+            self.tp_flags[idx] = trade.tp1_hit | (trade.tp2_hit << 1) | (trade.tp3_hit << 2)
+    
+    def remove_trade(self, symbol: str) -> None:
+        idx = self.sym_to_idx.pop(symbol, None)
+        if idx is None:
+            return
+        self.symbols[idx] = None
+        self.side[idx] = 0
+        self.tp_flags[idx] = 0
+        self._free.append(idx)
+    
+    def price_column(self, prices: Dict[str, int]) -> np.ndarray:
+        """Prices (fixed-point) aligned to the table slots; free slots stay 0"""
+        column = np.zeros(len(self.symbols), dtype=np.int64)
+        for symbol, idx in self.sym_to_idx.items():
+            price = prices.get(symbol)
+            if price is not None:
+                column[idx] = price
+        return column
+    
+    def trigger_levels(self) -> Dict[str, tuple]:
+        """symbol -> (is_buy, stop loss, next pending TP), fixed-point, from the columns"""
+        flags = self.tp_flags
+        next_tp = np.where(
+            (flags & TP1_FLAG) == 0, self.tp1,
+            np.where((flags & TP2_FLAG) == 0, self.tp2, self.tp3)
+        ).tolist()
+        side = self.side.tolist()
+        sl = self.sl.tolist()
+        return {
+            symbol: (side[idx] > 0, sl[idx], next_tp[idx])
+            for symbol, idx in self.sym_to_idx.items()
+        }
+    
+    def evaluate(self, prices: np.ndarray) -> np.ndarray:
+        """
+        Event bits per slot in one pass (see core.positions_nb.evaluate_levels):
+        EVENT_PARTIAL_TP when the next pending TP was reached, plus
+        EXIT_STOP_LOSS / EXIT_TAKE_PROFIT; free or unpriced slots are 0
+        """
+        return evaluate_levels(
+            prices, self.side, self.sl, self.tp1, self.tp2, self.tp3, self.tp_flags
+        )
+
+
+class PriceRing:
+    """
+    Ring buffer SPSC de ticks (sym_id, preço em ponto fixo, timestamp monotônico)
+    
+    Um único produtor (thread do WebSocket) escreve o slot e só então avança
+    `head`; um único consumidor (thread do loop) lê até `head` e avança `tail`.
+    Nenhum lado bloqueia o outro. Se o produtor der a volta no consumidor, os
+    ticks mais antigos são descartados (só o último preço por símbolo importa).
+    """
+    
+    def __init__(self, capacity: int = 4096):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self._mask = capacity - 1
+        self._capacity = capacity
+        self._buf = np.zeros(
+            capacity, dtype=[('sym', np.int32), ('price', np.int64), ('ts', np.float64)]
+        )
+        self.head = 0  # escrito só pelo produtor
+        self.tail = 0  # escrito só pelo consumidor
+    
+    def push(self, sym_id: int, price: int, ts: float) -> None:
+        """Producer side: write one tick"""
+        self._buf[self.head & self._mask] = (sym_id, price, ts)
+        self.head += 1
+    
+    def drain(self) -> np.ndarray:
+        """Consumer side: copy out every tick published since the last drain"""
+        head = self.head
+        tail = max(self.tail, head - self._capacity)
+        if head == tail:
+            return self._buf[:0]
+        
+        idx = np.arange(tail, head) & self._mask
+        ticks = self._buf[idx]
+        self.tail = head
+        return ticks
 
 
 class TradeManager:
@@ -266,6 +569,36 @@ class TradeManager:
         self.settings = settings
         self.mode = mode
         self.logger = logging.getLogger(f'TradingBot.TradeManager.{mode}')
+        # Nível DEBUG consultado 1x por ciclo (guarda logs com argumentos caros)
+        self._log_debug = self.logger.isEnabledFor(logging.DEBUG)
+        
+        # ✅ Timeframe não muda em runtime: intervalo e idade máxima calculados uma vez
+        # (idade máxima = 1 candle + 10min no testnet / +5min no live)
+        self._interval_seconds = _INTERVAL_SEC.get(settings.ENTRY_TIMEFRAME, 3600)
+        self._max_data_age = self._interval_seconds + (600 if mode == 'testnet' else 300)
+        self._max_data_age_ns = self._max_data_age * 1_000_000_000
+        # Relógio de parede (epoch ns) lido uma vez por scan; workers comparam com o índice dos candles
+        self._scan_wall_ns: Optional[int] = None
+        self._signal_cooldown_ns = settings.SIGNAL_COOLDOWN_SECONDS * 1_000_000_000
+        # Próximo fechamento de candle (epoch, alinhado ao intervalo); avança 1 intervalo por ciclo
+        self._next_candle_deadline = (
+            time.time() // self._interval_seconds * self._interval_seconds + self._interval_seconds
+        )
+        
+        # ✅ Multiplicadores de slippage fixos (1 ∓ SLIPPAGE_PERCENT) para _close_trade
+        slippage = Decimal(str(settings.SLIPPAGE_PERCENT))
+        self._slip_mul_buy = Decimal(1) - slippage
+        self._slip_mul_sell = Decimal(1) + slippage
+        # ✅ Taxa taker resolvida uma vez (Decimal + ponto fixo) para os checks por tick
+        self._taker_fee = Decimal(str(settings.TAKER_FEE))
+        self._taker_fee_i = to_fixed(self._taker_fee)
+        # ✅ Colunas constantes das linhas de trades/orders (mescladas via ** em cada INSERT)
+        self._trade_row_base = {
+            'strategy': settings.STRATEGY_MODE,
+            'timeframe': settings.ENTRY_TIMEFRAME,
+            'mode': mode
+        }
+        self._exit_order_base = {'order_type': 'MARKET', 'status': 'FILLED', 'mode': mode}
         
         # Validate configuration
         if mode == 'testnet':
@@ -278,7 +611,13 @@ class TradeManager:
         self.logger.info("Initializing Trade Manager...")
         
         # Database
-        self.db_manager = DatabaseManager(settings.DATABASE_URL)
+        self.db_manager = DatabaseManager(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
         
         # Backup manager
         self.backup_manager = BackupManager(settings)
@@ -293,6 +632,8 @@ class TradeManager:
         
         # Strategy
         self.strategy = StrategyFactory.create_strategy(settings.STRATEGY_MODE)
+        # Compila os kernels numba agora, não no primeiro scan
+        warmup_indicators()
         
         # Multi-timeframe analyzer
         self.mtf_analyzer = MultiTimeframeAnalyzer(
@@ -302,12 +643,68 @@ class TradeManager:
             require_alignment=settings.REQUIRE_MTF_ALIGNMENT
         )
         
-        # State
-        self.running = False
-        self.open_trades: Dict[str, TestnetTrade] = {}
-        self.last_signal_time: Dict[str, datetime] = {}
-        self.last_backup_time = datetime.utcnow()
-        self.last_recon_time = datetime.utcnow()
+        # ✅ Pool de scan criado uma vez (I/O da exchange em paralelo por símbolo)
+        self.scan_executor = ThreadPoolExecutor(
+            # 2 timeframes por par buscados em paralelo no prefetch
+            max_workers=max(1, min(settings.SCAN_CONCURRENCY, 2 * len(settings.TRADING_PAIRS))),
+            thread_name_prefix="scan"
+        )
+        
+        # ✅ Cache de klines por (symbol, timeframe), válido até o próximo candle
+        self._klines_cache: Dict[tuple, tuple] = {}  # single-writer: thread do loop
+        
+        # ✅ Stream de klines (opcional): símbolos com candle fechado chegam nesta fila
+        self._bar_events: queue.SimpleQueue = queue.SimpleQueue()
+        self._kline_stream: Optional[ThreadedWebsocketManager] = None
+        
+        # ✅ Stream de preços (opcional): último preço por símbolo (writer: thread do WS)
+        self._price_stream: Optional[ThreadedWebsocketManager] = None
+        self._live_prices: Dict[str, tuple] = {}  # single-writer: thread do loop (drena o ring)
+        self._price_ring = PriceRing()
+        self._sym_ids = {symbol: i for i, symbol in enumerate(settings.TRADING_PAIRS)}
+        # Níveis de SL/próximo TP publicados pelo loop (troca atômica do dict inteiro)
+        self._trigger_levels: Dict[str, tuple] = {}
+        self._price_alert = threading.Event()
+        # Snapshot de todos os tickers da iteração atual (None fora do loop)
+        self._loop_tickers: Optional[Dict[str, Decimal]] = None
+        # Equity da iteração atual: dimensiona as entradas do scan sem novo GET /account
+        self._loop_equity: Optional[Decimal] = None
+        
+        # ✅ Notificações assíncronas: fila limitada drenada por uma thread (não trava o loop)
+        self._notify_q: queue.Queue = queue.Queue(maxsize=_NOTIFY_QUEUE_SIZE)
+        self._notify_min = _NOTIFY_LEVELS.get(settings.NOTIFY_LEVEL.upper(), 0)
+        self._notify_thread = threading.Thread(
+            target=self._notify_worker,
+            name="notify",
+            daemon=True
+        )
+        self._notify_thread.start()
+        
+        # ✅ Persistência fora do caminho de trade: fila FIFO sem limite drenada pela
+        # thread db-writer (sessão própria, um commit por lote)
+        self._db_q: queue.Queue = queue.Queue()
+        self._db_thread = threading.Thread(
+            target=self._db_writer_loop,
+            name="db-writer",
+            daemon=True
+        )
+        self._db_thread.start()
+        
+        # State: evento de parada (set = parado); acorda qualquer espera do loop
+        self._stop_event = threading.Event()
+        self._stop_event.set()
+        self._stop_lock = threading.Lock()
+        self._stopped = False
+        self.open_trades: Dict[str, TestnetTrade] = {}  # single-writer: thread do loop
+        self._open_count = 0  # single-writer: contador mantido em open/close
+        self._trade_table = OpenTradesTable()  # single-writer: espelho colunar de open_trades
+        # ✅ Instante (time.monotonic_ns, int) do último trade aberto por símbolo
+        self.last_signal_time: Dict[str, int] = {}  # single-writer: thread do loop
+        # Último snapshot de saldos gravado (asset -> (free, locked))
+        self._last_balance_snapshot: Optional[Dict[str, Tuple[Decimal, Decimal]]] = None
+        # Instantes (time.monotonic) do último backup / reconciliação
+        self.last_backup_time = time.monotonic()
+        self.last_recon_time = time.monotonic()
         
         # ✅ SINCRONIZAÇÃO: Rastreamento de capital esperado
         self.expected_equity: Optional[Decimal] = None
@@ -321,133 +718,258 @@ class TradeManager:
         
         self.logger.info(f"✅ Trade Manager initialized in {mode} mode")
     
+    def _notify(self, title: str, message: str, level: str = "INFO", **fields) -> None:
+        """
+        Enqueue a notification (sent by the notify worker thread); dropped if the queue is full
+        
+        With `fields`, title/message are str.format templates filled in by the worker.
+        Levels below settings.NOTIFY_LEVEL are dropped before anything is built.
+        """
+        if _NOTIFY_LEVELS.get(level, 0) < self._notify_min:
+            return
+        try:
+            self._notify_q.put_nowait((title, message, level, fields))
+        except queue.Full:
+            self.logger.warning("Notification queue full, dropping: %s", title)
+    
+    def _notify_worker(self) -> None:
+        """Drain the notification queue, coalescing bursts within ~1s"""
+        levels = _NOTIFY_LEVELS
+        
+        while True:
+            item = self._notify_q.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + 1.0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._notify_q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            
+            try:
+                batch = [
+                    (title.format(**fields), body.format(**fields), lvl) if fields
+                    else (title, body, lvl)
+                    for title, body, lvl, fields in batch
+                ]
+                if len(batch) == 1:
+                    notify(self.settings, *batch[0])
+                else:
+                    level = max((lvl for _, _, lvl in batch), key=lambda lvl: levels.get(lvl, 0))
+                    message = "\n\n".join(f"{title}\n{body}" for title, body, _ in batch)
+                    notify(self.settings, f"{len(batch)} notifications", message, level)
+            except Exception as e:
+                self.logger.error(f"Failed to send notification: {e}")
+            
+            if stop:
+                return
+    
+    def _persist(self, kind: str, trade: TestnetTrade, payload: Any) -> None:
+        """Enqueue a DB write for the db-writer thread (never blocks the loop)"""
+        self._db_q.put((kind, trade, payload))
+    
+    def _db_writer_loop(self) -> None:
+        """Drain the DB queue in batches of up to _DB_BATCH_SIZE, one commit per batch"""
+        while True:
+            item = self._db_q.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            stop = False
+            while len(batch) < _DB_BATCH_SIZE:
+                try:
+                    nxt = self._db_q.get(timeout=0.5)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            
+            try:
+                with self.db_manager.session_scope() as session:
+                    for kind, trade, payload in batch:
+                        # Savepoint por item: uma falha não descarta o lote inteiro
+                        try:
+                            with session.begin_nested():
+                                self._db_apply(session, kind, trade, payload)
+                        except Exception as e:
+                            self.logger.error(f"Failed to save {kind} for {trade.symbol} to DB: {e}")
+            except Exception as e:
+                self.logger.error(f"DB writer batch failed ({len(batch)} items): {e}")
+            
+            if stop:
+                break
+        
+        # Session desta thread (scoped) não sobrevive a ela
+        self.db_manager.remove_session()
+    
+    def _db_apply(self, session: Session, kind: str, trade: TestnetTrade, payload: Any) -> None:
+        """
+        Apply one queued write (runs on the db-writer thread)
+        
+        A fila é FIFO: a linha OPEN de um trade é gravada antes das ordens
+        parciais dele, então db_trade_id já está preenchido quando elas chegam.
+        """
+        if kind == 'open':
+            trade.db_trade_id = session.execute(_INSERT_TRADE, payload).inserted_primary_key[0]
+        elif kind == 'order':
+            if trade.db_trade_id is None:
+                # INSERT da linha OPEN falhou: sem FK para a ordem, mas não descartar em silêncio
+                self.logger.warning(
+                    "Order %s for %s not saved to DB: trade row missing (OPEN insert failed)",
+                    payload.get('exchange_order_id'), trade.symbol
+                )
+                return
+            session.execute(_INSERT_ORDER, {**payload, 'trade_id': trade.db_trade_id})
+        elif kind == 'closed':
+            row, exits = payload
+            trade_id = session.execute(_INSERT_TRADE, row).inserted_primary_key[0]
+            # Saídas parciais em um único INSERT executemany
+            if exits:
+                session.execute(_INSERT_ORDER, [{**order, 'trade_id': trade_id} for order in exits])
+        else:
+            raise ValueError(f"Unknown DB write kind: {kind}")
+    
     def _reconcile_state(self) -> None:
         """Reconcile local database state with exchange"""
         self.logger.info("Reconciling state with exchange...")
         
         try:
-            session = self.db_manager.get_session()
-            
-            # Get open trades from database
-            db_open_trades = session.query(Trade).filter(
-                Trade.status == 'OPEN',
-                Trade.mode == self.mode
-            ).all()
-            
-            # Get open orders from exchange
+            # ✅ Chamadas REST antes da sessão: o lock do SQLite não fica preso
+            # esperando a Binance (a thread db-writer continua gravando)
             exchange_orders = self.exchange.get_open_orders()
             exchange_order_ids = {
                 str(order['orderId']) for order in exchange_orders
             }
+            account = self._fetch_account()
             
-            # Check each database trade
-            for trade in db_open_trades:
-                symbol = trade.symbol
-                
-                # Check if orders still exist
-                trade_orders = session.query(Order).filter(
-                    Order.trade_id == trade.id,
-                    Order.status.in_(['NEW', 'PARTIALLY_FILLED'])
+            with self.db_manager.session_scope() as session:
+                # ✅ Trades abertos + ordens ativas numa única query (LEFT JOIN),
+                # só as colunas usadas; ordens FILLED/CANCELLED ficam no banco
+                rows = session.execute(
+                    select(Trade.id, Trade.symbol, Order.exchange_order_id)
+                    .outerjoin(
+                        Order,
+                        (Order.trade_id == Trade.id)
+                        & Order.status.in_(('NEW', 'PARTIALLY_FILLED'))
+                    )
+                    .where(Trade.status == 'OPEN', Trade.mode == self.mode)
                 ).all()
                 
-                has_open_orders = any(
-                    order.exchange_order_id in exchange_order_ids
-                    for order in trade_orders
-                )
+                trade_symbols: Dict[int, str] = {}
+                active_order_ids: Dict[int, Set[str]] = defaultdict(set)
+                for trade_id, symbol, exchange_order_id in rows:
+                    trade_symbols[trade_id] = symbol
+                    if exchange_order_id is not None:
+                        active_order_ids[trade_id].add(exchange_order_id)
                 
-                if not has_open_orders:
-                    self.logger.warning(
-                        f"Trade {trade.id} for {symbol} has no open orders. "
-                        f"Checking position..."
+                # Check each database trade
+                orphan_ids = []
+                for trade_id, symbol in trade_symbols.items():
+                    # Check if orders still exist
+                    has_open_orders = not exchange_order_ids.isdisjoint(
+                        active_order_ids.get(trade_id, ())
                     )
                     
-                    trade.status = 'CLOSED'
-                    trade.exit_time = datetime.utcnow()
-                    
-                    self.logger.info(f"Closed orphaned trade {trade.id}")
-            
-            # Update account balance
-            self._update_balance(session)
-            
-            session.commit()
-            session.close()
+                    if not has_open_orders:
+                        self.logger.warning(
+                            f"Trade {trade_id} for {symbol} has no open orders. "
+                            f"Checking position..."
+                        )
+                        orphan_ids.append(trade_id)
+                
+                # ✅ Órfãos fechados em um único UPDATE
+                if orphan_ids:
+                    session.execute(
+                        update(Trade).where(Trade.id.in_(orphan_ids)).values(
+                            status='CLOSED',
+                            exit_time=datetime.utcnow()
+                        )
+                    )
+                    for trade_id in orphan_ids:
+                        self.logger.info(f"Closed orphaned trade {trade_id}")
+                
+                # Update account balance
+                if account is not None:
+                    self._update_balance(session, account)
+                
+            # Ressincroniza o contador com as posições gerenciadas
+            self._open_count = len(self.open_trades)
             
             self.logger.info("✅ State reconciliation complete")
             
         except Exception as e:
             self.logger.error(f"Reconciliation failed: {e}", exc_info=True)
     
-    def _update_balance(self, session: Session) -> None:
-        """Update account balance in database"""
+    def _fetch_account(self) -> Optional[Dict[str, Any]]:
+        """Fetch account balances for the snapshot (None if the API call fails)"""
         try:
-            account = self.exchange.get_account()
-            
+            # ✅ Saldos zerados já filtrados pela API (menos payload e parsing)
+            return self.exchange.get_account(omit_zero_balances=True)
+        except Exception as e:
+            self.logger.error(f"Failed to update balance: {e}")
+            return None
+    
+    def _update_balance(self, session: Session, account: Dict[str, Any]) -> None:
+        """Update account balance in database from an already fetched account"""
+        try:
+            snapshot = {}
             for balance_info in account['balances']:
-                asset = balance_info['asset']
                 free = safe_decimal(balance_info['free'])
                 locked = safe_decimal(balance_info['locked'])
-                total = free + locked
                 
-                if total > 0:
-                    balance = Balance(
-                        asset=asset,
-                        free=free,
-                        locked=locked,
-                        total=total,
-                        mode=self.mode,
-                        timestamp=datetime.utcnow()
-                    )
-                    session.add(balance)
+                if free + locked > 0:
+                    snapshot[balance_info['asset']] = (free, locked)
+            
+            # ✅ Snapshot idêntico ao último gravado: nada a inserir (tabela não cresce à toa)
+            if not snapshot or snapshot == self._last_balance_snapshot:
+                return
+            
+            # ✅ Um único INSERT executemany para o snapshot inteiro
+            now = datetime.utcnow()
+            Balance.bulk_snapshot(session, [
+                {
+                    'asset': asset,
+                    'free': free,
+                    'locked': locked,
+                    'total': free + locked,
+                    'mode': self.mode,
+                    'timestamp': now
+                }
+                for asset, (free, locked) in snapshot.items()
+            ])
+            self._last_balance_snapshot = snapshot
             
         except Exception as e:
             self.logger.error(f"Failed to update balance: {e}")
     
-    def _get_interval_seconds(self) -> int:
-        """
-        ✅ CANDLE CLOSING: Converte interval string para segundos
-        
-        Returns:
-            Número de segundos no intervalo
-        """
-        interval = self.settings.ENTRY_TIMEFRAME
-        
-        interval_map = {
-            '1m': 60,
-            '5m': 300,
-            '15m': 900,
-            '30m': 1800,
-            '1h': 3600,
-            '4h': 14400,
-            '1d': 86400,
-        }
-        
-        return interval_map.get(interval, 3600)
-    
-    def _get_max_data_age(self) -> int:
-
-        seconds_per_interval = self._get_interval_seconds()
-        
-        if self.mode == 'testnet':
-            # Testnet mais permissivo
-            max_age_seconds = seconds_per_interval + 600  # +10min
-        else:
-            # Live mais rigoroso
-            max_age_seconds = seconds_per_interval + 300  # +5min
-        
-        return max_age_seconds
-    
     def _wait_for_candle_close(self) -> None:
 
-        seconds_per_interval = self._get_interval_seconds()
+        seconds_per_interval = self._interval_seconds
         
-        # Calcular segundos até próximo fechamento de candle
-        now = datetime.utcnow()
-        
-        # Quantos segundos já se passaram neste período?
-        seconds_into_period = (now.hour * 3600 + now.minute * 60 + now.second) % seconds_per_interval
+        # ✅ Deadline guardado: só subtração, sem datetime/modulo por ciclo
+        now = time.time()
+        deadline = self._next_candle_deadline
+        if deadline <= now:
+            # Ciclo atrasou mais de um candle: realinha ao próximo fechamento
+            deadline = now // seconds_per_interval * seconds_per_interval + seconds_per_interval
+        self._next_candle_deadline = deadline + seconds_per_interval
         
         # Quantos segundos faltam para o próximo candle fechar?
-        seconds_until_next = seconds_per_interval - seconds_into_period
+        seconds_until_next = deadline - now
         
         # Esperar até 30s ANTES do fechamento
         wait_time = seconds_until_next - 30
@@ -458,17 +980,148 @@ class TradeManager:
                 f"⏱️ Waiting {wait_time:.0f}s for candle to close "
                 f"({seconds_until_next:.0f}s remaining in this candle)"
             )
-            time.sleep(wait_time)
+            self._sleep(wait_time)
         else:
             self.logger.debug(f"Candle closing soon, skipping wait")
     
+    def _start_kline_stream(self) -> None:
+        """Subscribe to entry-timeframe kline streams for all trading pairs"""
+        tf = self.settings.ENTRY_TIMEFRAME
+        streams = [f"{symbol.lower()}@kline_{tf}" for symbol in self.settings.TRADING_PAIRS]
+        
+        self._kline_stream = ThreadedWebsocketManager(
+            testnet=(self.mode == 'testnet'),
+            loop=_new_stream_loop()
+        )
+        self._kline_stream.start()
+        self._kline_stream.start_multiplex_socket(
+            callback=self._on_kline_message,
+            streams=streams
+        )
+        self.logger.info(f"📡 Kline stream started: {len(streams)} streams ({tf})")
+    
+    def _on_kline_message(self, msg: Dict) -> None:
+        """WebSocket callback: enqueue symbol when its candle closes"""
+        data = msg.get('data', msg)
+        kline = data.get('k') if isinstance(data, dict) else None
+        
+        if kline and kline.get('x'):
+            self._bar_events.put(data['s'])
+    
+    def _start_price_stream(self) -> None:
+        """Subscribe to 1s miniTicker streams for all trading pairs"""
+        streams = [f"{symbol.lower()}@miniTicker" for symbol in self.settings.TRADING_PAIRS]
+        
+        self._price_stream = ThreadedWebsocketManager(
+            testnet=(self.mode == 'testnet'),
+            loop=_new_stream_loop()
+        )
+        self._price_stream.start()
+        self._price_stream.start_multiplex_socket(
+            callback=self._on_price_message,
+            streams=streams
+        )
+        self.logger.info(f"📡 Price stream started: {len(streams)} streams")
+    
+    def _on_price_message(self, msg: Dict) -> None:
+        """WebSocket callback: store last price, wake the loop if a SL/TP level was crossed"""
+        data = msg.get('data', msg)
+        if not isinstance(data, dict) or 'c' not in data:
+            return
+        
+        symbol = data['s']
+        sym_id = self._sym_ids.get(symbol)
+        if sym_id is None:
+            return
+        price = to_fixed(Decimal(data['c']))
+        self._price_ring.push(sym_id, price, time.monotonic())
+        
+        levels = self._trigger_levels.get(symbol)
+        if levels is None:
+            return
+        
+        # Mesmos inteiros de ponto fixo da checagem do loop: sem alarme falso por arredondamento
+        is_buy, stop_loss, next_tp = levels
+        if is_buy:
+            crossed = price <= stop_loss or price >= next_tp
+        else:
+            crossed = price >= stop_loss or price <= next_tp
+        
+        if crossed:
+            self._price_alert.set()
+    
+    def _publish_trigger_levels(self) -> None:
+        """Publish SL / next-TP levels of open trades for the price stream callback"""
+        # Lidos das colunas do OpenTradesTable; troca a referência inteira:
+        # o callback nunca vê um dict pela metade
+        self._trigger_levels = self._trade_table.trigger_levels()
+    
+    def _check_positions(self) -> None:
+        """Run only the open-trade update (SL/TP) outside the candle cycle"""
+        if not self.open_trades:
+            return
+        
+        try:
+            prices = self._fetch_ticker_snapshot(self.open_trades.keys())
+            self._update_open_trades(prices)
+        except Exception as e:
+            self.logger.error(f"Error checking positions: {e}", exc_info=True)
+        
+        self._publish_trigger_levels()
+    
+    def _sleep(self, seconds: float) -> None:
+        """Sleep until timeout or stop, handling price-stream SL/TP alerts meanwhile"""
+        deadline = time.monotonic() + seconds
+        while not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self._price_alert.wait(remaining):
+                self._price_alert.clear()
+                if not self._stop_event.is_set():
+                    self._check_positions()
+    
+    def _wait_for_bar_event(self) -> None:
+        """Block until a candle closes on the stream (falls back to the clock)"""
+        deadline = time.monotonic() + self._interval_seconds
+        while True:
+            if self._price_alert.is_set() and not self._stop_event.is_set():
+                self._price_alert.clear()
+                self._check_positions()
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning("⚠️ No kline close event within one interval, running loop anyway")
+                return
+            try:
+                symbol = self._bar_events.get(timeout=min(remaining, 1.0))
+                break
+            except queue.Empty:
+                continue
+        
+        # Candles de todos os pares fecham juntos: drena a fila num único ciclo
+        # (None é o sinal de parada enviado por stop())
+        closed = {symbol}
+        while True:
+            try:
+                closed.add(self._bar_events.get_nowait())
+            except queue.Empty:
+                break
+        closed.discard(None)
+        if self._log_debug:
+            self.logger.debug(f"Candle closed for {sorted(closed)}")
+    
+    @property
+    def running(self) -> bool:
+        """True while the trading loop is active"""
+        return not self._stop_event.is_set()
+    
     def start(self) -> None:
         """Start the trading loop com circuit breaker check mais frequente"""
-        self.running = True
+        self._stop_event.clear()
         self.logger.info(f"🚀 Starting {self.mode} trading loop...")
         
-        notify(
-            self.settings,
+        self._notify(
             f"Trading Bot Started - {self.mode.upper()}",
             f"Strategy: {self.settings.STRATEGY_MODE}\n"
             f"Pairs: {', '.join(self.settings.TRADING_PAIRS)}\n"
@@ -476,19 +1129,39 @@ class TradeManager:
             "INFO"
         )
         
+        # ✅ Filtros dos pares parseados uma vez (exchangeInfo já carregado no client)
+        for symbol in self.settings.TRADING_PAIRS:
+            try:
+                self.exchange.get_symbol_filters(symbol)
+            except Exception as e:
+                self.logger.warning(f"Failed to load filters for {symbol}: {e}")
+        
+        if self.settings.USE_KLINE_STREAM:
+            try:
+                self._start_kline_stream()
+            except Exception as e:
+                self.logger.error(f"Failed to start kline stream, using clock: {e}")
+                self._kline_stream = None
+        
+        if self.settings.USE_PRICE_STREAM:
+            try:
+                self._start_price_stream()
+            except Exception as e:
+                self.logger.error(f"Failed to start price stream, using REST tickers: {e}")
+                self._price_stream = None
+        
         try:
-            last_cb_check = datetime.utcnow()
+            last_cb_check = time.monotonic()
             
             while self.running:
                 try:
                     # Check circuit breaker a cada 10 segundos
-                    now = datetime.utcnow()
-                    if (now - last_cb_check).seconds > 10:
+                    now = time.monotonic()
+                    if now - last_cb_check > 10:
                         triggered, reason = self.risk_manager.is_circuit_breaker_triggered()
                         if triggered:
                             self.logger.error(f"🚨 CIRCUIT BREAKER (mid-check): {reason}")
-                            notify(
-                                self.settings,
+                            self._notify(
                                 "🚨 Circuit Breaker Triggered (Emergency)",
                                 reason,
                                 "ERROR"
@@ -499,8 +1172,14 @@ class TradeManager:
                         
                         last_cb_check = now
                     
-                    # Wait for candle close
-                    self._wait_for_candle_close()
+                    # Wait for candle close (evento do stream ou relógio)
+                    if self._kline_stream is not None:
+                        self._wait_for_bar_event()
+                    else:
+                        self._wait_for_candle_close()
+                    
+                    if self._stop_event.is_set():
+                        break
                     
                     # Execute trading loop
                     self._trading_loop()
@@ -508,8 +1187,8 @@ class TradeManager:
                 except Exception as e:
                     self.logger.error(f"Trading loop error: {e}", exc_info=True)
                 
-                # Pequeno delay
-                time.sleep(5)
+                # Pequeno delay (interrompido imediatamente por stop())
+                self._sleep(5)
                 
         except KeyboardInterrupt:
             self.logger.info("Received stop signal")
@@ -519,9 +1198,9 @@ class TradeManager:
             self.stop()
     
     def _trading_loop(self) -> None:
+        self._log_debug = self.logger.isEnabledFor(logging.DEBUG)
         try:
-            session = self.db_manager.get_session()
-            
+            # DB fica com a thread db-writer: a iteração não abre sessão
             now = datetime.utcnow()
             
             # ✅ NOVO: Reset diário
@@ -530,18 +1209,19 @@ class TradeManager:
                 self.logger.info("📊 Daily tracking reset for new day")
             
             # ✅ NOVO: Backup periódico
-            time_since_backup = (now - self.last_backup_time).total_seconds()
+            now_mono = time.monotonic()
+            time_since_backup = now_mono - self.last_backup_time
             if time_since_backup > 3600:
-                self.logger.info("⏰ Performing periodic backup...")
-                self.backup_manager.backup()
-                self.last_backup_time = now
+                self.logger.info("⏰ Requesting periodic backup...")
+                self.backup_manager.request_backup()
+                self.last_backup_time = now_mono
             
             # ✅ NOVO: Reconciliação periódica
-            time_since_recon = (now - self.last_recon_time).total_seconds()
+            time_since_recon = now_mono - self.last_recon_time
             if time_since_recon > 3600:
                 self.logger.info("🔄 Periodic reconciliation with exchange...")
                 self._reconcile_state()
-                self.last_recon_time = now
+                self.last_recon_time = now_mono
             
             # # ✅ NOVO: Time sync periódica
             # time_since_sync = (now - self.last_time_sync).total_seconds()
@@ -550,14 +1230,21 @@ class TradeManager:
             #     self._sync_time_with_server()
             #     self.last_time_sync = now
             
+            # ✅ Snapshot de tickers da iteração: reutilizado por equity, trades e ordens
+            try:
+                self._loop_tickers = self.exchange.get_all_ticker_prices()
+            except Exception as e:
+                self.logger.warning(f"Ticker snapshot failed: {e}")
+                self._loop_tickers = None
+            
             # ✅ Atualizar equity
             try:
-                total_equity = self.exchange.get_total_balance_usdt()
-                self.logger.debug(f"Current equity: ${total_equity:.2f}")
+                total_equity = self.exchange.get_total_balance_usdt(prices=self._loop_tickers)
+                self._loop_equity = total_equity
+                self.logger.debug("Current equity: $%.2f", total_equity)
                 self._track_equity_drift(total_equity)
             except Exception as e:
                 self.logger.error(f"Failed to get equity: {e}")
-                session.close()
                 return
             
             self.risk_manager.update_equity_tracking(total_equity)
@@ -566,29 +1253,32 @@ class TradeManager:
             triggered, reason = self.risk_manager.is_circuit_breaker_triggered()
             if triggered:
                 self.logger.error(f"🚨 CIRCUIT BREAKER TRIGGERED: {reason}")
-                notify(self.settings, "🚨 Circuit Breaker", reason, "ERROR")
+                self._notify("🚨 Circuit Breaker", reason, "ERROR")
                 self.backup_manager.backup()
                 self.stop()
-                session.close()
                 return
             
-            # ✅ Update open trades
+            # ✅ Update open trades (1 snapshot de preços para todos os trades)
             try:
-                self._update_open_trades(session)
+                prices = self._fetch_ticker_snapshot(self.open_trades.keys())
+                self._update_open_trades(prices, now)
             except Exception as e:
                 self.logger.error(f"Error updating trades: {e}", exc_info=True)
             
             # ✅ Scan for new opportunities
             try:
-                self._scan_opportunities(session)
+                self._scan_opportunities()
             except Exception as e:
                 self.logger.error(f"Error scanning opportunities: {e}", exc_info=True)
             
-            session.commit()
-            session.close()
+            self._publish_trigger_levels()
             
         except Exception as e:
             self.logger.error(f"Trading loop fatal error: {e}", exc_info=True)
+        finally:
+            # Fora da iteração (checagens por alerta de preço) busca preços novos
+            self._loop_tickers = None
+            self._loop_equity = None
     
     def _track_equity_drift(self, current_equity: Decimal) -> None:
         if self.expected_equity is None:
@@ -619,153 +1309,255 @@ class TradeManager:
         # Atualizar último conhecimento
         self.last_known_equity = current_equity
     
-    def _update_open_trades(self, session: Session) -> None:
-        """Atualizar trades abertos E executar partial TPs"""
+    def _fetch_ticker_snapshot(self, symbols) -> Dict[str, Decimal]:
+        """Current prices for the given symbols from one all-tickers request"""
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        
+        # Preços recentes do stream dispensam a chamada REST
+        snapshot = self._stream_prices(symbols)
+        missing = [symbol for symbol in symbols if symbol not in snapshot]
+        if not missing:
+            return snapshot
+        
+        prices = self._loop_tickers
+        if prices is None:
+            try:
+                prices = self.exchange.get_all_ticker_prices()
+            except Exception as e:
+                self.logger.warning(f"Ticker snapshot failed, trying multi-symbol request: {e}")
+                try:
+                    prices = self.exchange.get_ticker_prices(missing)
+                except Exception as e:
+                    self.logger.warning(f"Multi-symbol ticker failed, falling back to per-symbol: {e}")
+                    return snapshot
         
-        for symbol, trade in list(self.open_trades.items()):
+        snapshot.update({symbol: prices[symbol] for symbol in missing if symbol in prices})
+        return snapshot
+    
+    def _stream_prices(self, symbols, max_age: float = 5.0) -> Dict[str, Decimal]:
+        """Latest stream prices (Decimal) for symbols seen within max_age seconds"""
+        live = self._live_prices
+        
+        # Drena os ticks do WebSocket; o último por símbolo prevalece
+        ticks = self._price_ring.drain()
+        if len(ticks):
+            pairs = self.settings.TRADING_PAIRS
+            for sym_id, price, ts in ticks.tolist():
+                live[pairs[sym_id]] = (ts, price)
+        
+        if not live:
+            return {}
+        
+        now = time.monotonic()
+        prices = {}
+        for symbol in symbols:
+            entry = live.get(symbol)
+            if entry is not None and now - entry[0] < max_age:
+                prices[symbol] = from_fixed(entry[1])
+        return prices
+    
+    def _update_open_trades(
+        self,
+        prices: Optional[Dict[str, Decimal]] = None,
+        now: Optional[datetime] = None
+    ) -> None:
+        """Atualizar trades abertos E executar partial TPs (now: timestamp do ciclo)"""
+        prices = prices or {}
+        pending = []
+        partials = []
+        table = self._trade_table
+        log_info = self.logger.info
+        
+        # ✅ Um preço (Decimal) por trade aberto; faltantes no snapshot vêm de
+        # uma única chamada multi-símbolo (REST por símbolo só se ela falhar)
+        missing = [symbol for symbol in self.open_trades if symbol not in prices]
+        if missing:
+            try:
+                prices = {**prices, **self.exchange.get_ticker_prices(missing)}
+            except Exception as e:
+                self.logger.warning(f"Multi-symbol ticker failed, falling back to per-symbol: {e}")
+        
+        live_prices: Dict[str, Decimal] = {}
+        for symbol, trade in self.open_trades.items():
+            current_price = prices.get(symbol)
+            if current_price is None:
+                try:
+                    current_price = self.exchange.get_ticker_price(symbol)
+                except Exception as e:
+                    self.logger.error(f"Error updating trade {symbol}: {e}", exc_info=True)
+                    continue
+            if not isinstance(current_price, Decimal):
+                current_price = Decimal(str(current_price))
+            live_prices[symbol] = current_price
+            if symbol not in table.sym_to_idx:
+                table.add_trade(trade)
+        
+        if not live_prices:
+            return
+        
+        # ✅ Partial TP, SL e TP de todos os trades avaliados numa única passada;
+        # só as linhas com evento seguem para check_partial_tp / execução de ordem
+        fixed_prices = {symbol: to_fixed(price) for symbol, price in live_prices.items()}
+        events = table.evaluate(table.price_column(fixed_prices))
+        
+        # ✅ Só os slots com algum bit ligado entram no caminho lento (Python)
+        hot = np.flatnonzero(events)
+        if not hot.size:
+            return
+        
+        # Um único timestamp para a passada inteira (o do ciclo, se fornecido)
+        current_time = now or datetime.utcnow()
+        
+        for idx in hot.tolist():
+            symbol = table.symbols[idx]
+            current_price = live_prices[symbol]
+            trade = self.open_trades[symbol]
             try:
-                current_price = self.exchange.get_ticker_price(symbol)
-                current_time = datetime.utcnow()
-                
                 # ✅ VERIFICAR E EXECUTAR PARTIAL TPs
-                tp_hit = trade.check_partial_tp(
-                    Decimal(str(current_price)),
-                    current_time,
-                    self.settings.TAKER_FEE
-                )
+                tp_hit = None
+                if events[idx] & EVENT_PARTIAL_TP:
+                    tp_hit = trade.check_partial_tp(
+                        current_price,
+                        current_time,
+                        self._taker_fee,
+                        price_i=fixed_prices[symbol],
+                        fee_i=self._taker_fee_i
+                    )
                 
                 if tp_hit:
-                    self.logger.info(
-                        f"💰 {tp_hit} atingido para {symbol}: "
-                        f"Posição parcial será fechada"
-                    )
+                    self._trade_table.update_flags(trade)
+                    log_info("💰 %s atingido para %s: Posição parcial será fechada", tp_hit, symbol)
                     
                     # ✅ DETERMINAR QUANTIDADE A FECHAR
                     if tp_hit == 'TP1':
-                        qty_to_sell = trade.initial_quantity * Decimal('0.3')
+                        qty_to_sell = trade._tp_qty1
                     elif tp_hit == 'TP2':
-                        qty_to_sell = trade.initial_quantity * Decimal('0.4')
+                        qty_to_sell = trade._tp_qty2
                     else:  # TP3
                         qty_to_sell = trade.quantity
                     
-                    # ✅ EXECUTAR ORDEM REAL
-                    try:
-                        exit_side = 'SELL' if trade.side == 'BUY' else 'BUY'
-                        
-                        self.logger.info(
-                            f"📤 Closing partial: {qty_to_sell} {symbol} @ market"
-                        )
-                        
-                        partial_order = self.exchange.create_order(
-                            symbol=symbol,
-                            side=exit_side,
-                            order_type='MARKET',
-                            quantity=qty_to_sell,
-                            test=False
-                        )
-                        
-                        actual_exit_price = Decimal(str(
-                            partial_order.get('avgPrice', current_price)
-                        ))
-                        partial_order_id = partial_order.get('orderId')
-                        
-                        self.logger.info(
-                            f"✅ Partial exit executed: "
-                            f"ID={partial_order_id} | "
-                            f"Qty={qty_to_sell} | "
-                            f"Price=${actual_exit_price}"
-                        )
-                        
-                        # ✅ SALVAR ORDEM DE SAÍDA PARCIAL NO DB
-                        db_trade = session.query(Trade).filter(
-                            Trade.exchange_order_id != None,
-                            Trade.symbol == symbol,
-                            Trade.status == 'OPEN'
-                        ).first()
-                        
-                        if db_trade:
-                            exit_order = Order(
-                                trade_id=db_trade.id,
-                                symbol=symbol,
-                                side=exit_side,
-                                order_type='MARKET',
-                                quantity=qty_to_sell,
-                                executed_quantity=qty_to_sell,
-                                avg_price=actual_exit_price,
-                                status='FILLED',
-                                exchange_order_id=str(partial_order_id),
-                                mode=self.mode
-                            )
-                            session.add(exit_order)
-                        
-                    except BinanceAPIException as e:
-                        self.logger.error(
-                            f"❌ Failed to execute partial exit: {e.message}"
-                        )
-                        continue
-                    
-                    # ✅ SE TOTALMENTE FECHADO VIA TP3
-                    if trade.status == 'CLOSED':
-                        self.open_trades.pop(symbol)
-                        self._save_closed_trade_to_db(session, symbol, trade)
-                        
-                        self.logger.info(
-                            f"✅ Trade completamente fechado via TPs parciais: "
-                            f"PnL Total=${trade.pnl:.2f} ({trade.pnl_percent:+.2f}%)"
-                        )
-                        
-                        notify(
-                            self.settings,
-                            f"✅ Trade Closed - {symbol}",
-                            f"Method: Partial Take Profits\n"
-                            f"Total PnL: ${trade.pnl:.2f}\n"
-                            f"Return: {trade.pnl_percent:+.2f}%",
-                            "INFO"
-                        )
-                    
-                    session.commit()
+                    # Ordem enviada junto com as dos demais TPs deste tick (abaixo)
+                    partials.append((symbol, trade, qty_to_sell, current_price))
                     continue
                 
-                # ✅ CHECK STOP LOSS (para quantidade restante)
-                if trade.side == 'BUY' and current_price <= float(trade.stop_loss):
-                    exit_price = trade.stop_loss
-                    self._close_trade(
-                        session, symbol, trade, exit_price,
-                        current_time, 'STOP_LOSS'
-                    )
-                    continue
-                
-                if trade.side == 'SELL' and current_price >= float(trade.stop_loss):
-                    exit_price = trade.stop_loss
+                # SL/TP da quantidade restante avaliados em lote abaixo
+                exit_bits = events[idx] & (EXIT_STOP_LOSS | EXIT_TAKE_PROFIT)
+                if exit_bits:
+                    pending.append((symbol, trade, exit_bits))
+            
+            except Exception as e:
+                self.logger.error(f"Error updating trade {symbol}: {e}", exc_info=True)
+        
+        if partials:
+            self._execute_partial_exits(partials)
+        
+        if not pending:
+            return
+        
+        # ✅ CHECK STOP LOSS / TAKE PROFIT: bits já calculados na passada acima
+        # (ponto fixo int64; side = +1 BUY / -1 SELL elimina o branch por lado)
+        for symbol, trade, exit_bits in pending:
+            if symbol not in table.sym_to_idx:
+                continue
+            try:
+                # Stop loss tem prioridade sobre take profit
+                if exit_bits & EXIT_STOP_LOSS:
                     self._close_trade(
-                        session, symbol, trade, exit_price,
+                        symbol, trade, trade.stop_loss,
                         current_time, 'STOP_LOSS'
                     )
-                    continue
-                
-                # ✅ CHECK TAKE PROFIT
-                if trade.side == 'BUY' and current_price >= float(trade.take_profit):
-                    exit_price = trade.take_profit
+                else:
                     self._close_trade(
-                        session, symbol, trade, exit_price,
+                        symbol, trade, trade.take_profit,
                         current_time, 'TAKE_PROFIT'
                     )
+            except Exception as e:
+                self.logger.error(f"Error updating trade {symbol}: {e}", exc_info=True)
+    
+    def _execute_partial_exits(
+        self,
+        partials: List[Tuple[str, TestnetTrade, Decimal, Decimal]]
+    ) -> None:
+        """
+        Enviar as ordens de saída parcial de um tick em paralelo e registrar os resultados
+        
+        Args:
+            partials: (symbol, trade, qty_to_sell, current_price) por TP atingido
+        """
+        log_info = self.logger.info
+        
+        # ✅ EXECUTAR ORDENS REAIS: todas submetidas antes de esperar qualquer uma
+        # (M saídas no mesmo tick custam ~1 RTT em vez de M)
+        futures = []
+        for symbol, trade, qty_to_sell, _ in partials:
+            log_info("📤 Closing partial: %s %s @ market", qty_to_sell, symbol)
+            futures.append(self.scan_executor.submit(
+                self.exchange.create_order,
+                symbol=symbol,
+                side=trade.exit_side,
+                order_type='MARKET',
+                quantity=qty_to_sell,
+                test=False
+            ))
+        
+        # Resultados na ordem de submissão: escritas no DB seguem determinísticas
+        for (symbol, trade, qty_to_sell, current_price), future in zip(partials, futures):
+            try:
+                try:
+                    partial_order = future.result()
+                except BinanceAPIException as e:
+                    self.logger.error(
+                        f"❌ Failed to execute partial exit: {e.message}"
+                    )
                     continue
                 
-                if trade.side == 'SELL' and current_price <= float(trade.take_profit):
-                    exit_price = trade.take_profit
-                    self._close_trade(
-                        session, symbol, trade, exit_price,
-                        current_time, 'TAKE_PROFIT'
+                # Campos da resposta já são strings (e o fallback já é Decimal): sem str()
+                actual_exit_price = Decimal(partial_order.get('avgPrice', current_price))
+                partial_order_id = partial_order.get('orderId')
+                self.exchange.invalidate_balance_cache()
+                
+                log_info(
+                    "✅ Partial exit executed: ID=%s | Qty=%s | Price=$%s",
+                    partial_order_id, qty_to_sell, actual_exit_price
+                )
+                
+                # ✅ SALVAR ORDEM DE SAÍDA PARCIAL NO DB (thread db-writer)
+                # trade_id vem do PK guardado na abertura: sem SELECT por disparo de TP
+                self._persist('order', trade, {
+                    **self._exit_order_base,
+                    'symbol': symbol,
+                    'side': trade.exit_side,
+                    'quantity': qty_to_sell,
+                    'executed_quantity': qty_to_sell,
+                    'avg_price': actual_exit_price,
+                    'exchange_order_id': str(partial_order_id)
+                })
+                
+                # ✅ SE TOTALMENTE FECHADO VIA TP3
+                if trade.status == 'CLOSED':
+                    self.open_trades.pop(symbol)
+                    self._trade_table.remove_trade(symbol)
+                    self._open_count -= 1
+                    self._invalidate_klines(symbol)
+                    self._save_closed_trade_to_db(symbol, trade)
+                    
+                    log_info(
+                        "✅ Trade completamente fechado via TPs parciais: PnL Total=$%.2f (%+.2f%%)",
+                        trade.pnl, trade.pnl_percent
+                    )
+                    
+                    self._notify(
+                        "✅ Trade Closed - {symbol}", _TRADE_PARTIAL_CLOSE_TMPL, "INFO",
+                        symbol=symbol, pnl=trade.pnl, pnl_pct=trade.pnl_percent
                     )
-                    continue
             
             except Exception as e:
                 self.logger.error(f"Error updating trade {symbol}: {e}", exc_info=True)
     
     def _close_trade(
         self,
-        session: Session,
         symbol: str,
         trade: TestnetTrade,
         exit_price: Decimal,
@@ -776,214 +1568,354 @@ class TradeManager:
         ✅ SLIPPAGE CONSISTENTE: Fechar trade com slippage (IGUAL AO BACKTEST)
         """
         
-        # ✅ SINCRONIZAÇÃO: Aplicar slippage IGUAL ao backtest
-        slippage = exit_price * self.settings.SLIPPAGE_PERCENT
-        
-        if trade.side == 'BUY':
+        # ✅ SINCRONIZAÇÃO: Aplicar slippage IGUAL ao backtest (multiplicador pré-calculado)
+        if trade._sign > 0:
             # Para compra longa, slippage reduz preço de saída
-            slipped_exit_price = exit_price - slippage
-            self.logger.debug(
-                f"Slippage (BUY): ${exit_price:.2f} → ${slipped_exit_price:.2f} "
-                f"(-${slippage:.4f})"
-            )
+            slipped_exit_price = exit_price * self._slip_mul_buy
+            if self._log_debug:
+                self.logger.debug(
+                    "Slippage (BUY): $%.2f → $%.2f (-$%.4f)",
+                    exit_price, slipped_exit_price, exit_price - slipped_exit_price
+                )
         else:
             # Para venda curta, slippage aumenta preço de saída (piora)
-            slipped_exit_price = exit_price + slippage
-            self.logger.debug(
-                f"Slippage (SELL): ${exit_price:.2f} → ${slipped_exit_price:.2f} "
-                f"(+${slippage:.4f})"
-            )
+            slipped_exit_price = exit_price * self._slip_mul_sell
+            if self._log_debug:
+                self.logger.debug(
+                    "Slippage (SELL): $%.2f → $%.2f (+$%.4f)",
+                    exit_price, slipped_exit_price, slipped_exit_price - exit_price
+                )
         
         # Usar preço com slippage para PnL
         trade.close(
             exit_price=slipped_exit_price,
             exit_time=exit_time,
             reason=reason,
-            fee_rate=self.settings.TAKER_FEE
+            fee_rate=self._taker_fee,
+            fee_i=self._taker_fee_i
         )
         
-        # Atualizar risk manager
+        # Atualizar risk manager (saldo mudou: descarta o cache)
         self.risk_manager.update_daily_pnl(trade.pnl)
-        current_equity = self.exchange.get_total_balance_usdt()
+        self.exchange.invalidate_balance_cache()
+        current_equity = self.exchange.get_total_balance_usdt(prices=self._loop_tickers)
         self.risk_manager.update_equity_tracking(current_equity)
+        if self._loop_equity is not None:
+            self._loop_equity = current_equity
         
         # Remover de open trades
-        self.open_trades.pop(symbol, None)
+        if self.open_trades.pop(symbol, None) is not None:
+            self._open_count -= 1
+        self._trade_table.remove_trade(symbol)
+        self._invalidate_klines(symbol)
         
         # Salvar no DB
-        self._save_closed_trade_to_db(session, symbol, trade)
+        self._save_closed_trade_to_db(symbol, trade)
         
         pnl_emoji = "✅" if trade.pnl > 0 else "❌"
         self.logger.info(
-            f"{pnl_emoji} Trade fechado: {trade.side} {symbol} | "
-            f"Motivo: {reason} | "
-            f"PnL: ${trade.pnl:.2f} ({trade.pnl_percent:+.2f}%)"
+            "%s Trade fechado: %s %s | Motivo: %s | PnL: $%.2f (%+.2f%%)",
+            pnl_emoji, trade.side, symbol, reason, trade.pnl, trade.pnl_percent
         )
         
-        notify(
-            self.settings,
-            f"{pnl_emoji} Trade Closed - {symbol}",
-            f"Side: {trade.side}\n"
-            f"Entry: ${trade.entry_price}\n"
-            f"Exit: ${slipped_exit_price} (com slippage)\n"
-            f"Reason: {reason}\n"
-            f"PnL: ${trade.pnl:.2f} ({trade.pnl_percent:+.2f}%)",
-            "INFO"
+        self._notify(
+            "{emoji} Trade Closed - {symbol}", _TRADE_CLOSE_TMPL, "INFO",
+            emoji=pnl_emoji, symbol=symbol, side=trade.side, entry=trade.entry_price,
+            exit=slipped_exit_price, reason=reason, pnl=trade.pnl, pnl_pct=trade.pnl_percent
         )
     
-    def _save_closed_trade_to_db(self, session: Session, symbol: str, trade: TestnetTrade) -> None:
-        """Save closed trade to database"""
-        try:
-            db_trade = Trade(
-                symbol=symbol,
-                side=trade.side,
-                entry_price=trade.entry_price,
-                exit_price=trade.exit_price,
-                quantity=trade.initial_quantity,
-                stop_loss=trade.stop_loss,
-                take_profit=trade.take_profit,
-                status='CLOSED',
-                entry_time=trade.entry_time,
-                exit_time=trade.exit_time,
-                pnl=trade.pnl,
-                pnl_percent=trade.pnl_percent,
-                fees=trade.fees,
-                strategy=self.settings.STRATEGY_MODE,
-                timeframe=self.settings.ENTRY_TIMEFRAME,
-                notes=trade.exit_reason,
-                mode=self.mode
-            )
-            session.add(db_trade)
-            session.flush()
-            
-            # Save partial exits if any
-            for partial in trade.partial_exits:
-                order = Order(
-                    trade_id=db_trade.id,
-                    symbol=symbol,
-                    side='SELL' if trade.side == 'BUY' else 'BUY',
-                    order_type='MARKET',
-                    quantity=partial['quantity'],
-                    executed_quantity=partial['quantity'],
-                    status='FILLED',
-                    avg_price=partial['price'],
-                    mode=self.mode
-                )
-                session.add(order)
-            
-            session.commit()
-            
-        except Exception as e:
-            self.logger.error(f"Failed to save trade to DB: {e}")
-            session.rollback()
+    def _save_closed_trade_to_db(self, symbol: str, trade: TestnetTrade) -> None:
+        """Queue the closed trade (and its partial exits) for the db-writer thread"""
+        exit_side = trade.exit_side
+        row = {
+            **self._trade_row_base,
+            'symbol': symbol,
+            'side': trade.side,
+            'entry_price': trade.entry_price,
+            'exit_price': trade.exit_price,
+            'quantity': trade.initial_quantity,
+            'stop_loss': trade.stop_loss,
+            'take_profit': trade.take_profit,
+            'status': 'CLOSED',
+            'entry_time': trade.entry_time,
+            'exit_time': trade.exit_time,
+            'pnl': trade.pnl,
+            'pnl_percent': trade.pnl_percent,
+            'fees': trade.fees,
+            'notes': trade.exit_reason
+        }
+        order_base = self._exit_order_base
+        exits = [
+            {
+                **order_base,
+                'symbol': symbol,
+                'side': exit_side,
+                'quantity': partial['quantity'],
+                'executed_quantity': partial['quantity'],
+                'avg_price': partial['price']
+            }
+            for partial in trade.partial_exits
+        ]
+        self._persist('closed', trade, (row, exits))
     
-    def _scan_opportunities(self, session: Session) -> None:
+    def _scan_opportunities(self) -> None:
 
-        can_trade, reason = self.risk_manager.can_open_trade(len(self.open_trades))
+        # ✅ Contador em memória (sem COUNT no DB); filtro por par no dict
+        can_trade, reason = self.risk_manager.can_open_trade(self._open_count)
         
         if not can_trade:
-            self.logger.debug(f"Cannot open new trades: {reason}")
+            self.logger.debug("Cannot open new trades: %s", reason)
             return
         
+        # Todos os pares já têm trade aberto: nada a escanear
+        if self._open_count >= len(self.settings.TRADING_PAIRS):
+            return
+        
+        # ✅ Filtros baratos antes de qualquer chamada de rede
+        now_ns = time.monotonic_ns()
+        self._scan_wall_ns = time.time_ns()
+        symbols = []
         for symbol in self.settings.TRADING_PAIRS:
+            ok, why = self._should_scan(symbol, now_ns)
+            if not ok:
+                self.logger.debug("Skipping %s: %s", symbol, why)
+                continue
+            symbols.append(symbol)
+        
+        if not symbols:
+            return
+        
+        # ✅ Klines (par x timeframe) e análises no pool; ordens e DB continuam na thread do loop
+        outputs = self._scan_symbols(symbols)
+        
+        # single-writer: só a thread do loop grava o cache de klines
+        results = []
+        for result, cache_updates in outputs:
+            self._klines_cache.update(cache_updates)
+            results.append(result)
+        
+        self._apply_signals(results)
+
+    def _should_scan(self, symbol: str, now_ns: int) -> Tuple[bool, str]:
+        """
+        In-memory pre-filters for one symbol (no I/O)
+        
+        Returns:
+            (ok, reason) - reason explains why the symbol is skipped
+        """
+        if symbol in self.open_trades:
+            return False, "already have open trade"
+        
+        cooldown_ns = self._signal_cooldown_ns
+        last_ns = self.last_signal_time.get(symbol)
+        if cooldown_ns and last_ns is not None and now_ns - last_ns < cooldown_ns:
+            return False, "signal cooldown"
+        
+        return True, ""
+    
+    def _scan_symbols(
+        self,
+        symbols: List[str]
+    ) -> List[Tuple[Optional[ScanResult], Dict[tuple, tuple]]]:
+        """
+        Fetch every missing (symbol, timeframe) concurrently and analyze each
+        symbol as soon as both of its timeframes are cached
+        
+        Returns:
+            _fetch_signal outputs, in the order of `symbols`
+        """
+        now_mono = time.monotonic()
+        waiting: Dict[str, int] = {}
+        fetches = {}
+        for symbol in symbols:
+            waiting[symbol] = 0
+            for timeframe in (self.settings.PRIMARY_TIMEFRAME, self.settings.ENTRY_TIMEFRAME):
+                cached = self._klines_cache.get((symbol, timeframe))
+                if cached is None or now_mono >= cached[0]:
+                    future = self.scan_executor.submit(self._fetch_klines_entry, (symbol, timeframe))
+                    fetches[future] = symbol
+                    waiting[symbol] += 1
+        
+        # Símbolos já em cache começam a análise imediatamente
+        analyses = {
+            symbol: self.scan_executor.submit(self._fetch_signal, symbol)
+            for symbol, count in waiting.items() if count == 0
+        }
+        
+        # single-writer: workers devolvem as entradas, a thread do loop grava;
+        # a análise de um par roda enquanto os demais ainda estão na rede
+        for future in as_completed(fetches):
+            self._klines_cache.update(future.result())
+            symbol = fetches[future]
+            waiting[symbol] -= 1
+            if waiting[symbol] == 0:
+                analyses[symbol] = self.scan_executor.submit(self._fetch_signal, symbol)
+        
+        return [analyses[symbol].result() for symbol in symbols]
+    
+    def _fetch_klines_entry(self, key: Tuple[str, str]) -> Dict[tuple, tuple]:
+        """Worker: fetch one (symbol, timeframe); failures are left to _evaluate_symbol"""
+        cache_updates: Dict[tuple, tuple] = {}
+        symbol, timeframe = key
+        try:
+            self._get_klines_cached(symbol, timeframe, limit=500, cache_updates=cache_updates)
+        except Exception as e:
+            self.logger.debug("Prefetch failed for %s %s: %s", symbol, timeframe, e)
+        return cache_updates
+    
+    def _fetch_signal(self, symbol: str) -> Tuple[Optional[ScanResult], Dict[tuple, tuple]]:
+        """
+        Worker: fetch klines and analyze one symbol
+        
+        Only reads shared state; new klines cache entries are returned for
+        the loop thread to store.
+        """
+        cache_updates: Dict[tuple, tuple] = {}
+        return self._evaluate_symbol(symbol, cache_updates), cache_updates
+    
+    def _evaluate_symbol(self, symbol: str, cache_updates: Dict[tuple, tuple]) -> Optional[ScanResult]:
+        """Fetch klines and analyze one symbol (no DB writes, thread-safe)"""
+        try:
             try:
-                if symbol in self.open_trades:
-                    self.logger.debug(f"Skipping {symbol}: already have open trade")
-                    continue
-                try:
-                    self.logger.debug(f"Fetching data for {symbol}...")
-                    
-                    # Buscar dados com limit (SEM end_time para testnet)
-                    primary_df = self.exchange.get_klines(
-                        symbol,
-                        self.settings.PRIMARY_TIMEFRAME,
-                        limit=500
-                    )
-                    
-                    entry_df = self.exchange.get_klines(
-                        symbol,
-                        self.settings.ENTRY_TIMEFRAME,
-                        limit=500
-                    )
-                    
-                except ValueError as e:
-                    self.logger.warning(f"❌ Failed to fetch data for {symbol}: {e}")
-                    continue
-                except Exception as e:
-                    self.logger.error(f"Unexpected error fetching data for {symbol}: {e}", exc_info=True)
-                    continue
-                
-                # ✅ VALIDAÇÃO: DataFrames não vazios
-                if primary_df.empty or entry_df.empty:
-                    self.logger.warning(
-                        f"❌ Empty DataFrame for {symbol}: "
-                        f"primary={len(primary_df)}, entry={len(entry_df)}"
-                    )
-                    continue
-                
-                # ✅ VALIDAÇÃO: Warmup mínimo
-                MIN_WARMUP_CANDLES = 200
-                if len(entry_df) < MIN_WARMUP_CANDLES:
-                    self.logger.debug(
-                        f"⚠️ {symbol}: Insufficient warmup "
-                        f"({len(entry_df)}/{MIN_WARMUP_CANDLES})"
-                    )
-                    continue
-                
-                # ✅ DATA FRESHNESS: Validação robusta
-                latest_entry_time = entry_df.index[-1]
-                age_seconds = (datetime.utcnow() - latest_entry_time.replace(tzinfo=None)).total_seconds()
-                max_age = self._get_max_data_age()
-                
-                if age_seconds > max_age:
-                    self.logger.warning(
-                        f"⚠️ Stale data for {symbol}: latest candle is {age_seconds:.0f}s old "
-                        f"(max: {max_age}s). Skipping this symbol."
-                    )
-                    continue
-                
-                # ✅ DATA FRESHNESS: Validação robusta
-                latest_entry_time = entry_df.index[-1]
-                age_seconds = (datetime.utcnow() - latest_entry_time.replace(tzinfo=None)).total_seconds()
+                self.logger.debug("Fetching data for %s...", symbol)
                 
-                # Máximo definido por timeframe (1 candle + 5min)
-                max_age = self._get_max_data_age()
-                
-                if age_seconds > max_age:
-                    self.logger.warning(
-                        f"⚠️ Stale data for {symbol}: latest candle is {age_seconds:.0f}s old "
-                        f"(max: {max_age}s). Skipping this symbol."
-                    )
-                    continue  # ✅ REJEIT A, não continua!
-                
-                # Multi-timeframe signal analysis
-                signal, strength, metadata = self.mtf_analyzer.analyze(
-                    primary_df,
-                    entry_df
+                # Buscar dados com limit (SEM end_time para testnet)
+                primary_df = self._get_klines_cached(
+                    symbol,
+                    self.settings.PRIMARY_TIMEFRAME,
+                    limit=500,
+                    cache_updates=cache_updates
                 )
                 
-                # ✅ LOG DETALHADO de todo sinal (mesmo HOLD)
-                self.logger.info(
-                    f"📊 {symbol}: Signal={signal:5s} | Strength={strength:.2f} | "
-                    f"Primary={metadata.get('primary_signal', 'N/A'):5s} | "
-                    f"Aligned={metadata.get('aligned', False)} | "
-                    f"Age={age_seconds:.0f}s"
+                entry_df = self._get_klines_cached(
+                    symbol,
+                    self.settings.ENTRY_TIMEFRAME,
+                    limit=500,
+                    cache_updates=cache_updates
                 )
                 
-                # ✅ SINCRONIZAÇÃO: MESMO threshold que backtest (0.40)
-                if signal in ['BUY', 'SELL'] and strength > 0.40:
+            except ValueError as e:
+                self.logger.warning(f"❌ Failed to fetch data for {symbol}: {e}")
+                return None
+            except Exception as e:
+                self.logger.error(f"Unexpected error fetching data for {symbol}: {e}", exc_info=True)
+                return None
+            
+            # ✅ VALIDAÇÃO: DataFrames não vazios (contagem de linhas lida uma vez)
+            n_primary = primary_df.shape[0]
+            n_entry = entry_df.shape[0]
+            if n_primary == 0 or n_entry == 0:
+                self.logger.warning(
+                    "❌ Empty DataFrame for %s: primary=%d, entry=%d",
+                    symbol, n_primary, n_entry
+                )
+                return None
+            
+            # ✅ VALIDAÇÃO: Warmup mínimo
+            if n_entry < _MIN_WARMUP_CANDLES:
+                self.logger.debug(
+                    "⚠️ %s: Insufficient warmup (%d/%d)",
+                    symbol, n_entry, _MIN_WARMUP_CANDLES
+                )
+                return None
+            
+            # ✅ DATA FRESHNESS: Validação robusta (relógio do scan, em ns inteiros)
+            # Timestamp.value é sempre ns, qualquer que seja a resolução do índice
+            age_ns = (self._scan_wall_ns or time.time_ns()) - entry_df.index[-1].value
+            
+            # Máximo definido por timeframe (1 candle + 5min)
+            if age_ns > self._max_data_age_ns:
+                self.logger.warning(
+                    "⚠️ Stale data for %s: latest candle is %.0fs old (max: %ss). Skipping this symbol.",
+                    symbol, age_ns / 1e9, self._max_data_age
+                )
+                return None  # ✅ REJEIT A, não continua!
+            
+            # Multi-timeframe signal analysis
+            signal, strength, metadata = self.mtf_analyzer.analyze(
+                primary_df,
+                entry_df
+            )
+            
+            # ✅ LOG DETALHADO de todo sinal (mesmo HOLD)
+            self.logger.info(
+                "📊 %s: Signal=%-5s | Strength=%.2f | Primary=%-5s | Aligned=%s | Age=%.0fs",
+                symbol, signal, strength, metadata.get('primary_signal', 'N/A'),
+                metadata.get('aligned', False), age_ns / 1e9
+            )
+            
+            return ScanResult(symbol, signal, strength, entry_df, metadata.get('atr'))
+        
+        except Exception as e:
+            self.logger.error(f"Error scanning {symbol}: {e}", exc_info=True)
+            return None
+
+    def _get_klines_cached(
+        self,
+        symbol: str,
+        timeframe: str,
+        limit: int,
+        cache_updates: Optional[Dict[tuple, tuple]] = None
+    ) -> 'pd.DataFrame':
+        """
+        get_klines com cache até o fechamento do candle mais recente
+        
+        Novas entradas vão para cache_updates quando informado (threads de scan),
+        senão direto para o cache (thread do loop).
+        """
+        key = (symbol, timeframe)
+        cached = self._klines_cache.get(key)
+        if cached is not None and len(cached[1]) >= limit:
+            if time.monotonic() < cached[0]:
+                return cached[1]
+            # ✅ Expirado: só os candles novos (+ o último, que podia estar aberto)
+            try:
+                df = self.exchange.get_klines_since(symbol, timeframe, cached[1], limit=limit)
+            except Exception as e:
+                self.logger.debug("Incremental klines failed for %s %s: %s", symbol, timeframe, e)
+                df = self.exchange.get_klines(symbol, timeframe, limit=limit)
+        else:
+            df = self.exchange.get_klines(symbol, timeframe, limit=limit)
+        
+        # Expira no próximo fechamento de candle (aritmética inteira sobre epoch)
+        tf_seconds = _INTERVAL_SEC.get(timeframe)
+        if tf_seconds is None:
+            return df
+        now_s = int(time.time())
+        ttl = (now_s // tf_seconds) * tf_seconds + tf_seconds - now_s
+        if ttl > 0:
+            target = self._klines_cache if cache_updates is None else cache_updates
+            target[key] = (time.monotonic() + ttl, df)
+        
+        return df
+    
+    def _invalidate_klines(self, symbol: str) -> None:
+        """Descarta o cache do timeframe de entrada após abrir/fechar trade"""
+        self._klines_cache.pop((symbol, self.settings.ENTRY_TIMEFRAME), None)
+    
+    def _apply_signals(self, results: List[Optional[ScanResult]]) -> None:
+        """Execute qualifying signals serially, in TRADING_PAIRS order"""
+        for result in results:
+            if result is None:
+                continue
+            
+            symbol, signal, strength = result.symbol, result.signal, result.strength
+            try:
+                # ✅ SINCRONIZAÇÃO: MESMO threshold que backtest (SIGNAL_STRENGTH_THRESHOLD)
+                if signal in ['BUY', 'SELL'] and strength > SIGNAL_STRENGTH_THRESHOLD:
                     self.logger.info(
-                        f"✅ TRADE SIGNAL for {symbol}: {signal} (strength={strength:.2f})"
+                        "✅ TRADE SIGNAL for %s: %s (strength=%.2f)", symbol, signal, strength
                     )
                     self._execute_trade(
-                        session, symbol, signal, strength, entry_df
+                        symbol, signal, strength, result.entry_df,
+                        atr=result.atr
                     )
                 else:
                     # Log quando sinal é rejeitado
                     if signal in ['BUY', 'SELL']:
                         self.logger.debug(
-                            f"⚠️ Signal {signal} for {symbol} rejected: "
-                            f"strength {strength:.2f} below threshold 0.40"
+                            "⚠️ Signal %s for %s rejected: strength %.2f below threshold %.2f",
+                            signal, symbol, strength, SIGNAL_STRENGTH_THRESHOLD
                         )
             
             except Exception as e:
@@ -991,23 +1923,29 @@ class TradeManager:
 
     def _execute_trade(
         self,
-        session: Session,
         symbol: str,
         signal: str,
         strength: float,
-        df: pd.DataFrame
+        df: 'pd.DataFrame',
+        atr: Optional[Decimal] = None
     ) -> None:
         """Executar novo trade COM ordem real no Binance"""
         
         try:
             # Calcular stops e quantidade
             filters = self.exchange.get_symbol_filters(symbol)
-            current_price = self.exchange.get_ticker_price(symbol)
+            
+            # Preço do snapshot de tickers (cache curto), ATR vindo da análise
+            current_price = self._fetch_ticker_snapshot([symbol]).get(symbol)
+            if current_price is None:
+                current_price = self.exchange.get_ticker_price(symbol)
+            if atr is None:
+                atr = self.mtf_analyzer.get_atr(df)
             
             stop_loss = self.risk_manager.calculate_stop_loss(
                 entry_price=current_price,
                 side=signal,
-                atr=self.mtf_analyzer.get_atr(df),
+                atr=atr,
                 use_atr=True
             )
             
@@ -1016,7 +1954,10 @@ class TradeManager:
                 side=signal
             )
             
-            total_capital = self.exchange.get_total_balance_usdt()
+            # ✅ Equity já lida nesta iteração (abrir posição só troca USDT pelo ativo)
+            total_capital = self._loop_equity
+            if total_capital is None:
+                total_capital = self.exchange.get_total_balance_usdt(prices=self._loop_tickers)
             
             quantity = self.risk_manager.calculate_dynamic_position_size(
                 capital=total_capital,
@@ -1031,9 +1972,7 @@ class TradeManager:
                 return
             
             # ✅ EXECUTAR ORDEM REAL NO TESTNET/LIVE
-            self.logger.info(
-                f"📤 Executing {signal} order: {quantity} {symbol} @ market"
-            )
+            self.logger.info("📤 Executing %s order: %s %s @ market", signal, quantity, symbol)
             
             try:
                 order_response = self.exchange.create_order(
@@ -1045,16 +1984,17 @@ class TradeManager:
                 )
                 
                 exchange_order_id = order_response.get('orderId')
-                executed_qty = Decimal(str(order_response.get('executedQty', 0)))
-                avg_price = Decimal(str(order_response.get('avgPrice', current_price)))
+                # Campos da resposta já são strings (e o fallback já é Decimal): sem str()
+                executed_qty = Decimal(order_response.get('executedQty') or '0')
+                avg_price = Decimal(order_response.get('avgPrice') or current_price)
                 
                 if not exchange_order_id:
                     self.logger.error(f"No order ID returned for {symbol}")
                     return
                 
                 self.logger.info(
-                    f"✅ Order executed: ID={exchange_order_id} | "
-                    f"Qty={executed_qty} | Avg=${avg_price}"
+                    "✅ Order executed: ID=%s | Qty=%s | Avg=$%s",
+                    exchange_order_id, executed_qty, avg_price
                 )
                 
                 if executed_qty < quantity:
@@ -1068,8 +2008,7 @@ class TradeManager:
                 self.logger.error(
                     f"❌ Order execution failed: {e.status_code} - {e.message}"
                 )
-                notify(
-                    self.settings,
+                self._notify(
                     f"❌ Order Failed - {symbol}",
                     f"Status: {e.status_code}\nMessage: {e.message}\n"
                     f"Quantity: {quantity}\nPrice: ${current_price}",
@@ -1082,74 +2021,96 @@ class TradeManager:
                 return
             
             # ✅ CRIAR TRADE LOCAL SÓ APÓS CONFIRMAÇÃO
+            entry_time = datetime.utcnow()
             trade = TestnetTrade(
                 symbol=symbol,
                 side=signal,
                 entry_price=actual_entry_price,
                 quantity=executed_qty,
-                entry_time=datetime.utcnow(),
+                entry_time=entry_time,
                 stop_loss=stop_loss,
                 take_profit=take_profit
             )
             
             self.open_trades[symbol] = trade
+            self._trade_table.add_trade(trade)
+            self._open_count += 1
+            self.last_signal_time[symbol] = time.monotonic_ns()
+            self.exchange.invalidate_balance_cache()
+            self._invalidate_klines(symbol)
             
-            # ✅ SALVAR NO DATABASE COM ORDER ID
-            db_trade = Trade(
-                symbol=symbol,
-                side=signal,
-                entry_price=actual_entry_price,
-                quantity=executed_qty,
-                stop_loss=stop_loss,
-                take_profit=take_profit,
-                status='OPEN',
-                entry_time=datetime.utcnow(),
-                exchange_order_id=str(exchange_order_id),
-                strategy=self.settings.STRATEGY_MODE,
-                timeframe=self.settings.ENTRY_TIMEFRAME,
-                signal_strength=strength,
-                mode=self.mode
-            )
-            session.add(db_trade)
-            session.commit()
-            
-            notify(
-                self.settings,
-                f"🎯 New Trade Opened - {symbol}",
-                f"Order ID: {exchange_order_id}\n"
-                f"Side: {signal}\n"
-                f"Entry: ${actual_entry_price}\n"
-                f"Quantity: {executed_qty}\n"
-                f"Stop Loss: ${stop_loss}\n"
-                f"Take Profit: ${take_profit}\n"
-                f"Signal Strength: {strength:.2f}",
-                "INFO"
+            # ✅ SALVAR NO DATABASE COM ORDER ID (thread db-writer preenche db_trade_id)
+            self._persist('open', trade, {
+                **self._trade_row_base,
+                'symbol': symbol,
+                'side': signal,
+                'entry_price': actual_entry_price,
+                'quantity': executed_qty,
+                'stop_loss': stop_loss,
+                'take_profit': take_profit,
+                'status': 'OPEN',
+                'entry_time': entry_time,
+                'exchange_order_id': str(exchange_order_id),
+                'signal_strength': strength
+            })
+            
+            self._notify(
+                "🎯 New Trade Opened - {symbol}", _TRADE_OPEN_TMPL, "INFO",
+                symbol=symbol, order_id=exchange_order_id, side=signal,
+                entry=actual_entry_price, qty=executed_qty, sl=stop_loss,
+                tp=take_profit, strength=strength
             )
             
             self.logger.info(
-                f"✅ Trade recorded: {symbol} {signal} @ ${actual_entry_price} × {executed_qty}"
+                "✅ Trade recorded: %s %s @ $%s × %s",
+                symbol, signal, actual_entry_price, executed_qty
             )
             
         except Exception as e:
             self.logger.error(f"Unexpected error in _execute_trade: {e}", exc_info=True)
-            session.rollback()
     
     def stop(self) -> None:
-        """Stop the trading loop"""
+        """Stop the trading loop (idempotent)"""
+        with self._stop_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._stop_event.set()
+            self._price_alert.set()
+        
         self.logger.info("Stopping trading loop...")
-        self.running = False
+        self._bar_events.put(None)  # acorda _wait_for_bar_event
         
         try:
+            if self._kline_stream is not None:
+                self._kline_stream.stop()
+                self._kline_stream = None
+            if self._price_stream is not None:
+                self._price_stream.stop()
+                self._price_stream = None
+            self.scan_executor.shutdown(wait=True)
+            # Sentinel: db-writer grava o que restou na fila antes do backup/close
+            self._db_q.put(None)
+            self._db_thread.join(timeout=30)
+            self.backup_manager.shutdown()
             self.exchange.close()
             self.db_manager.close()
         except:
             pass
         
-        notify(
-            self.settings,
+        self._notify(
             f"Trading Bot Stopped - {self.mode.upper()}",
             "Bot has been shut down",
             "INFO"
         )
         
+        # Sentinel: worker envia o que restou na fila e encerra
+        if self._notify_thread.is_alive():
+            # Pode esperar por espaço aqui: o loop já parou
+            try:
+                self._notify_q.put(None, timeout=10)
+            except queue.Full:
+                pass
+            self._notify_thread.join(timeout=10)
+        
         self.logger.info("✅ Trade Manager stopped")
\ No newline at end of file
@@ -8,12 +8,23 @@ import sys
 import logging
 from logging.handlers import TimedRotatingFileHandler
 from pathlib import Path
-from decimal import Decimal, ROUND_DOWN, ROUND_UP
-from typing import Optional, Dict, Any
+from decimal import Decimal, InvalidOperation, ROUND_DOWN, ROUND_UP, ROUND_HALF_EVEN
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping
 from datetime import datetime, timedelta
 import time
-from functools import wraps
+import threading
+from collections import deque
+from functools import lru_cache, wraps
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+
+from core.indicators_nb import NUMBA_AVAILABLE
+from core.metrics_nb import max_drawdown_nb
+
+# Logger do bot resolvido uma vez (setup_logging configura este mesmo objeto)
+_logger = logging.getLogger('TradingBot')
 
 
 def setup_logging(settings) -> logging.Logger:
@@ -26,7 +37,7 @@ def setup_logging(settings) -> logging.Logger:
     Returns:
         Configured logger instance
     """
-    logger = logging.getLogger('TradingBot')
+    logger = _logger
     logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper()))
     
     # Remove existing handlers
@@ -82,8 +93,10 @@ def round_down(value: Decimal, step_size: Decimal) -> Decimal:
     if step_size == 0:
         return value
     
-    precision = abs(step_size.as_tuple().exponent)
-    return Decimal(value).quantize(step_size, rounding=ROUND_DOWN)
+    # quantize é C (libmpdec): mais rápido que aritmética inteira em Python; só evita a cópia
+    if value.__class__ is not Decimal:
+        value = Decimal(value)
+    return value.quantize(step_size, rounding=ROUND_DOWN)
 
 
 def round_up(value: Decimal, step_size: Decimal) -> Decimal:
@@ -100,8 +113,10 @@ def round_up(value: Decimal, step_size: Decimal) -> Decimal:
     if step_size == 0:
         return value
     
-    precision = abs(step_size.as_tuple().exponent)
-    return Decimal(value).quantize(step_size, rounding=ROUND_UP)
+    # quantize é C (libmpdec): mais rápido que aritmética inteira em Python; só evita a cópia
+    if value.__class__ is not Decimal:
+        value = Decimal(value)
+    return value.quantize(step_size, rounding=ROUND_UP)
 
 
 def format_quantity(quantity: Decimal, step_size: Decimal) -> str:
@@ -117,10 +132,12 @@ def format_quantity(quantity: Decimal, step_size: Decimal) -> str:
     """
     rounded = round_down(quantity, step_size)
     
-    # Remove trailing zeros
-    result = f"{rounded:.8f}".rstrip('0').rstrip('.')
+    if step_size == 0:
+        # Remove trailing zeros
+        return f"{rounded:.8f}".rstrip('0').rstrip('.')
     
-    return result
+    # ✅ quantize já deixou o expoente do step: 'f' imprime exatamente essas casas
+    return format(rounded, 'f')
 
 
 def format_price(price: Decimal, tick_size: Decimal) -> str:
@@ -136,10 +153,12 @@ def format_price(price: Decimal, tick_size: Decimal) -> str:
     """
     rounded = round_down(price, tick_size)
     
-    # Remove trailing zeros
-    result = f"{rounded:.8f}".rstrip('0').rstrip('.')
+    if tick_size == 0:
+        # Remove trailing zeros
+        return f"{rounded:.8f}".rstrip('0').rstrip('.')
     
-    return result
+    # ✅ quantize já deixou o expoente do tick: 'f' imprime exatamente essas casas
+    return format(rounded, 'f')
 
 
 def calculate_quantity(
@@ -220,10 +239,9 @@ def retry_with_backoff(
                     if attempt == max_retries:
                         raise
                     
-                    logger = logging.getLogger('TradingBot')
-                    logger.warning(
-                        f"Attempt {attempt + 1}/{max_retries + 1} failed: {e}. "
-                        f"Retrying in {delay:.1f}s..."
+                    _logger.warning(
+                        "Attempt %d/%d failed: %s. Retrying in %.1fs...",
+                        attempt + 1, max_retries + 1, e, delay
                     )
                     
                     time.sleep(delay)
@@ -235,6 +253,13 @@ def retry_with_backoff(
     return decorator
 
 
+# Sessão HTTP compartilhada pelos envios de notificação: reaproveita a conexão
+# TLS (keep-alive) em vez de um handshake novo por mensagem. Pool pequeno
+# (Telegram + Slack) e sem retries do urllib3: falha vira log, não espera
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
+
 def send_telegram_message(
     token: str,
     chat_id: str,
@@ -264,12 +289,11 @@ def send_telegram_message(
             "parse_mode": parse_mode
         }
         
-        response = requests.post(url, json=payload, timeout=10)
+        response = _http.post(url, json=payload, timeout=10)
         return response.status_code == 200
         
     except Exception as e:
-        logger = logging.getLogger('TradingBot')
-        logger.error(f"Failed to send Telegram message: {e}")
+        _logger.error("Failed to send Telegram message: %s", e)
         return False
 
 
@@ -289,15 +313,20 @@ def send_slack_message(webhook_url: str, message: str) -> bool:
     
     try:
         payload = {"text": message}
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        response = _http.post(webhook_url, json=payload, timeout=10)
         return response.status_code == 200
         
     except Exception as e:
-        logger = logging.getLogger('TradingBot')
-        logger.error(f"Failed to send Slack message: {e}")
+        _logger.error("Failed to send Slack message: %s", e)
         return False
 
 
+@lru_cache(maxsize=1)
+def _notify_timestamp(second: int) -> str:
+    """Local time string for an epoch second (recomputed only when the second changes)"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+
+
 def notify(settings, title: str, message: str, level: str = "INFO") -> None:
     """
     Send notification via configured channels
@@ -308,10 +337,8 @@ def notify(settings, title: str, message: str, level: str = "INFO") -> None:
         message: Notification message
         level: Log level (INFO, WARNING, ERROR)
     """
-    logger = logging.getLogger('TradingBot')
-    
     # Format message
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = _notify_timestamp(int(time.time()))
     full_message = f"<b>{title}</b>\n{message}\n\n<i>{timestamp}</i>"
     
     # Send to Telegram
@@ -328,17 +355,17 @@ def notify(settings, title: str, message: str, level: str = "INFO") -> None:
         send_slack_message(settings.SLACK_WEBHOOK_URL, slack_message)
     
     # Log locally
-    log_func = getattr(logger, level.lower(), logger.info)
+    log_func = getattr(_logger, level.lower(), _logger.info)
     log_func(f"{title}: {message}")
 
 
-def calculate_sharpe_ratio(
+def calculate_risk_ratios(
     returns: list[float],
     risk_free_rate: float = 0.0,
     periods_per_year: int = 365
-) -> float:
+) -> tuple[float, float]:
     """
-    Calculate Sharpe ratio from returns
+    Calculate Sharpe and Sortino ratios in one pass over the returns
     
     Args:
         returns: List of period returns
@@ -346,21 +373,49 @@ def calculate_sharpe_ratio(
         periods_per_year: Number of periods per year
         
     Returns:
-        Sharpe ratio
+        Tuple of (sharpe, sortino)
     """
-    import numpy as np
-    
     if not returns or len(returns) < 2:
-        return 0.0
+        return 0.0, 0.0
+    
+    # ✅ Excesso de retorno, média e desvio calculados uma vez para os dois índices
+    excess_returns = np.asarray(returns, dtype=np.float64) - (risk_free_rate / periods_per_year)
+    mean = np.mean(excess_returns)
+    std = np.std(excess_returns)
+    annualize = np.sqrt(periods_per_year)
     
-    returns_array = np.array(returns)
-    excess_returns = returns_array - (risk_free_rate / periods_per_year)
+    if std == 0:
+        return 0.0, 0.0
+    sharpe = float(mean / std * annualize)
     
-    if np.std(excess_returns) == 0:
-        return 0.0
+    # Calculate downside deviation
+    downside_returns = excess_returns[excess_returns < 0]
+    if len(downside_returns) == 0:
+        return sharpe, 0.0
+    downside_std = np.std(downside_returns)
+    if downside_std == 0:
+        return sharpe, 0.0
     
-    sharpe = np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(periods_per_year)
-    return float(sharpe)
+    return sharpe, float(mean / downside_std * annualize)
+
+
+def calculate_sharpe_ratio(
+    returns: list[float],
+    risk_free_rate: float = 0.0,
+    periods_per_year: int = 365
+) -> float:
+    """
+    Calculate Sharpe ratio from returns
+    
+    Args:
+        returns: List of period returns
+        risk_free_rate: Annual risk-free rate
+        periods_per_year: Number of periods per year
+        
+    Returns:
+        Sharpe ratio
+    """
+    return calculate_risk_ratios(returns, risk_free_rate, periods_per_year)[0]
 
 
 def calculate_sortino_ratio(
@@ -379,22 +434,7 @@ def calculate_sortino_ratio(
     Returns:
         Sortino ratio
     """
-    import numpy as np
-    
-    if not returns or len(returns) < 2:
-        return 0.0
-    
-    returns_array = np.array(returns)
-    excess_returns = returns_array - (risk_free_rate / periods_per_year)
-    
-    # Calculate downside deviation
-    downside_returns = excess_returns[excess_returns < 0]
-    
-    if len(downside_returns) == 0 or np.std(downside_returns) == 0:
-        return 0.0
-    
-    sortino = np.mean(excess_returns) / np.std(downside_returns) * np.sqrt(periods_per_year)
-    return float(sortino)
+    return calculate_risk_ratios(returns, risk_free_rate, periods_per_year)[1]
 
 
 def calculate_max_drawdown(equity_curve: list[float]) -> tuple[float, int, int]:
@@ -407,20 +447,28 @@ def calculate_max_drawdown(equity_curve: list[float]) -> tuple[float, int, int]:
     Returns:
         Tuple of (max_drawdown_percent, peak_idx, trough_idx)
     """
-    import numpy as np
-    
     if not equity_curve or len(equity_curve) < 2:
         return 0.0, 0, 0
     
-    equity_array = np.array(equity_curve)
+    equity_array = np.array(equity_curve, dtype=np.float64)
+    
+    # ✅ Com numba: uma passada sem arrays temporários (curvas longas de backtest)
+    if NUMBA_AVAILABLE:
+        max_dd, peak_idx, trough_idx = max_drawdown_nb(equity_array)
+        return abs(float(max_dd)), int(peak_idx), int(trough_idx)
+    
     running_max = np.maximum.accumulate(equity_array)
     drawdown = (equity_array - running_max) / running_max
     
     max_dd_idx = np.argmin(drawdown)
     max_dd = abs(float(drawdown[max_dd_idx]))
     
-    # Find the peak before the max drawdown
-    peak_idx = np.argmax(equity_array[:max_dd_idx + 1]) if max_dd_idx > 0 else 0
+    # Find the peak before the max drawdown: running_max é não-decrescente, então o
+    # pico é a 1ª posição onde ele atinge running_max[max_dd_idx] (busca binária)
+    peak_idx = (
+        np.searchsorted(running_max, running_max[max_dd_idx], side='left')
+        if max_dd_idx > 0 else 0
+    )
     
     return max_dd, peak_idx, max_dd_idx
 
@@ -468,6 +516,57 @@ def datetime_to_timestamp(dt: datetime) -> int:
     return int(dt.timestamp() * 1000)
 
 
+# ✅ Filtros parseados por symbol_info (id -> (symbol_info, parsed)); o dict é
+# guardado junto para que o id não seja reutilizado por outro objeto
+_PARSED_FILTERS: Dict[int, tuple] = {}
+_PARSED_FILTERS_MAX = 4096
+
+
+def _parse_symbol_filters(symbol_info: Dict[str, Any]) -> tuple:
+    """
+    Decimal filter values of a symbol, parsed once per symbol_info dict
+    
+    Returns:
+        (lot, price, min_notional): lot = (min_qty, max_qty, step_size) or None,
+        price = (min_price, max_price, tick_size) or None, min_notional or None
+    """
+    key = id(symbol_info)
+    hit = _PARSED_FILTERS.get(key)
+    if hit is not None and hit[0] is symbol_info:
+        return hit[1]
+    
+    filters = {f['filterType']: f for f in symbol_info.get('filters', [])}
+    
+    lot = None
+    if 'LOT_SIZE' in filters:
+        lot_filter = filters['LOT_SIZE']
+        lot = (
+            Decimal(str(lot_filter['minQty'])),
+            Decimal(str(lot_filter['maxQty'])),
+            Decimal(str(lot_filter['stepSize']))
+        )
+    
+    price = None
+    if 'PRICE_FILTER' in filters:
+        price_filter = filters['PRICE_FILTER']
+        price = (
+            Decimal(str(price_filter['minPrice'])),
+            Decimal(str(price_filter['maxPrice'])),
+            Decimal(str(price_filter['tickSize']))
+        )
+    
+    min_notional = None
+    if 'MIN_NOTIONAL' in filters or 'NOTIONAL' in filters:
+        notional_filter = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL')
+        min_notional = Decimal(str(notional_filter.get('minNotional', 0)))
+    
+    parsed = (lot, price, min_notional)
+    if len(_PARSED_FILTERS) >= _PARSED_FILTERS_MAX:
+        _PARSED_FILTERS.clear()
+    _PARSED_FILTERS[key] = (symbol_info, parsed)
+    return parsed
+
+
 def validate_symbol_filters(
     symbol_info: Dict[str, Any],
     quantity: Decimal,
@@ -484,14 +583,11 @@ def validate_symbol_filters(
     Returns:
         Tuple of (is_valid, error_message)
     """
-    filters = {f['filterType']: f for f in symbol_info.get('filters', [])}
+    lot, price_limits, min_notional = _parse_symbol_filters(symbol_info)
     
     # LOT_SIZE filter
-    if 'LOT_SIZE' in filters:
-        lot_filter = filters['LOT_SIZE']
-        min_qty = Decimal(str(lot_filter['minQty']))
-        max_qty = Decimal(str(lot_filter['maxQty']))
-        step_size = Decimal(str(lot_filter['stepSize']))
+    if lot is not None:
+        min_qty, max_qty, step_size = lot
         
         if quantity < min_qty:
             return False, f"Quantity {quantity} below minimum {min_qty}"
@@ -499,17 +595,15 @@ def validate_symbol_filters(
         if quantity > max_qty:
             return False, f"Quantity {quantity} above maximum {max_qty}"
         
-        # Check step size compliance
+        # Check step size compliance (Decimal % do _decimal em C é mais rápido
+        # que escalar para int e usar %: scaleb + int() custam mais que o módulo)
         remainder = (quantity - min_qty) % step_size
         if remainder != 0:
             return False, f"Quantity {quantity} does not comply with step size {step_size}"
     
     # PRICE_FILTER
-    if 'PRICE_FILTER' in filters:
-        price_filter = filters['PRICE_FILTER']
-        min_price = Decimal(str(price_filter['minPrice']))
-        max_price = Decimal(str(price_filter['maxPrice']))
-        tick_size = Decimal(str(price_filter['tickSize']))
+    if price_limits is not None:
+        min_price, max_price, tick_size = price_limits
         
         if price < min_price:
             return False, f"Price {price} below minimum {min_price}"
@@ -523,10 +617,7 @@ def validate_symbol_filters(
             return False, f"Price {price} does not comply with tick size {tick_size}"
     
     # MIN_NOTIONAL filter
-    if 'MIN_NOTIONAL' in filters or 'NOTIONAL' in filters:
-        notional_filter = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL')
-        min_notional = Decimal(str(notional_filter.get('minNotional', 0)))
-        
+    if min_notional is not None:
         notional = quantity * price
         if notional < min_notional:
             return False, f"Notional {notional} below minimum {min_notional}"
@@ -547,37 +638,52 @@ class RateLimiter:
         """
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = []
+        # ✅ Timestamps monotônicos em ordem de chegada: o mais antigo é sempre requests[0]
+        self.requests: deque = deque(maxlen=max_requests)
+        # Chamado pelas threads do scan: janela e contagem mudam juntas
+        self._lock = threading.Lock()
+    
+    def _expire(self, now: float) -> None:
+        """Drop timestamps that left the window (O(1) amortized)"""
+        requests = self.requests
+        window = self.time_window
+        while requests and now - requests[0] >= window:
+            requests.popleft()
     
     def wait_if_needed(self) -> None:
         """Wait if rate limit would be exceeded"""
-        now = time.time()
-        
-        # Remove old requests outside time window
-        self.requests = [
-            req_time for req_time in self.requests 
-            if now - req_time < self.time_window
-        ]
-        
-        # Check if we need to wait
-        if len(self.requests) >= self.max_requests:
-            oldest_request = min(self.requests)
-            wait_time = self.time_window - (now - oldest_request)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
             
-            if wait_time > 0:
-                logger = logging.getLogger('TradingBot')
-                logger.warning(f"Rate limit reached. Waiting {wait_time:.2f}s...")
-                time.sleep(wait_time)
+            # Check if we need to wait
+            if len(self.requests) >= self.max_requests:
+                wait_time = self.time_window - (now - self.requests[0])
                 
-                # Clean up again after waiting
-                now = time.time()
-                self.requests = [
-                    req_time for req_time in self.requests 
-                    if now - req_time < self.time_window
-                ]
-        
-        # Record this request
-        self.requests.append(time.time())
+                if wait_time > 0:
+                    _logger.warning("Rate limit reached. Waiting %.2fs...", wait_time)
+                    time.sleep(wait_time)
+                    
+                    # Dormimos até o mais antigo sair da janela; com o lock ninguém
+                    # mais entrou, então basta descartá-lo (sem nova varredura)
+                    now = time.monotonic()
+                    self.requests.popleft()
+            
+            # Record this request
+            self.requests.append(now)
+
+
+def _decimal_from_number(value) -> Decimal:
+    return Decimal(str(value))
+
+
+# ✅ Conversor por tipo exato: um lookup de dict em vez da cadeia de isinstance
+_DEC_CONVERTERS = {
+    Decimal: lambda value: value,
+    str: Decimal,
+    int: Decimal,
+    float: _decimal_from_number,
+}
 
 
 def safe_decimal(value: Any, default: Decimal = Decimal("0")) -> Decimal:
@@ -591,14 +697,68 @@ def safe_decimal(value: Any, default: Decimal = Decimal("0")) -> Decimal:
     Returns:
         Decimal value
     """
-    try:
+    convert = _DEC_CONVERTERS.get(type(value))
+    if convert is None:
+        # Subclasses (ex.: numpy.float64) seguem o caminho antigo; bool não é número aqui
         if isinstance(value, Decimal):
             return value
-        elif isinstance(value, (int, float)):
-            return Decimal(str(value))
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            convert = _decimal_from_number
         elif isinstance(value, str):
-            return Decimal(value)
+            convert = Decimal
         else:
             return default
-    except:
-        return default
\ No newline at end of file
+    try:
+        return convert(value)
+    except (InvalidOperation, ValueError, TypeError):
+        return default
+
+
+# ✅ Segundos por timeframe (tabela fixa, somente leitura; evita parsing por chamada)
+_INTERVAL_SEC: Mapping[str, int] = MappingProxyType({
+    '1m': 60,
+    '3m': 180,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '2h': 7200,
+    '4h': 14400,
+    '6h': 21600,
+    '8h': 28800,
+    '12h': 43200,
+    '1d': 86400,
+    '3d': 259200,
+    '1w': 604800,
+})
+
+
+# Ponto fixo: preços/quantidades como inteiros escalados (8 casas, igual à Binance)
+PRICE_SCALE = 10 ** 8
+
+
+def to_fixed(value: Decimal) -> int:
+    """
+    Convert a Decimal to a fixed-point integer (scaled by PRICE_SCALE)
+    
+    Args:
+        value: Decimal value (exact up to 8 decimal places)
+        
+    Returns:
+        Scaled integer
+    """
+    return int((value * PRICE_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_fixed(value: int, scale: int = PRICE_SCALE) -> Decimal:
+    """
+    Convert a fixed-point integer back to Decimal
+    
+    Args:
+        value: Scaled integer
+        scale: Scale of value (PRICE_SCALE ** n after n-way products)
+        
+    Returns:
+        Decimal value
+    """
+    return Decimal(value) / scale
@@ -3,20 +3,57 @@ Database models for persistent state management
 SQLAlchemy ORM models for trades, orders, and performance tracking
 """
 
-from datetime import datetime
+import threading
+from contextlib import contextmanager, nullcontext
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, DateTime,
+    create_engine, event, insert, cast, select, Column, Integer, String, Float, DateTime,
     Boolean, Text, ForeignKey, Index, Numeric
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker, Session
+from sqlalchemy.orm import deferred, relationship, scoped_session, sessionmaker, Session
+from sqlalchemy.sql import Select
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.expression import FunctionElement
 
 Base = declarative_base()
 
 
+class utcnow(FunctionElement):
+    """
+    Current UTC time rendered by the database (naive, like datetime.utcnow)
+    
+    Used as a SQL-expression column default: the INSERT carries the function
+    call instead of a value built in Python, and still works on tables created
+    before the default existed (no server_default/migration needed).
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'sqlite')
+def _utcnow_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP do SQLite não tem fração de segundo
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, 'mysql')
+def _utcnow_mysql(element, compiler, **kw):
+    return 'UTC_TIMESTAMP(6)'
+
+
 class Trade(Base):
     """Trade record model"""
     __tablename__ = 'trades'
@@ -40,7 +77,7 @@ class Trade(Base):
     
     # Status and timing
     status = Column(String(20), default='OPEN', index=True)  # OPEN, CLOSED, CANCELLED
-    entry_time = Column(DateTime, default=datetime.utcnow, nullable=False)
+    entry_time = Column(DateTime, default=utcnow(), nullable=False)
     exit_time = Column(DateTime, nullable=True)
     
     # Performance metrics
@@ -57,16 +94,16 @@ class Trade(Base):
     timeframe = Column(String(10), nullable=True)
     signal_strength = Column(Float, nullable=True)
     
-    # Notes and metadata
-    notes = Column(Text, nullable=True)
+    # Notes and metadata (blobs de texto deferred: só carregam quando acessados)
+    notes = deferred(Column(Text, nullable=True))
     exchange_order_id = Column(String(50), unique=True, nullable=True, index=True)
     client_order_id = Column(String(50), unique=True, nullable=True, index=True)
     actual_entry_price = Column(Numeric(20, 8), nullable=True)
     actual_quantity = Column(Numeric(20, 8), nullable=True)
-    partial_exits = Column(Text, nullable=True)  # JSON
+    partial_exits = deferred(Column(Text, nullable=True))  # JSON
     actual_fees = Column(Numeric(20, 8), nullable=True)
     reconciled_at = Column(DateTime, nullable=True)
-    trade_metadata = Column(Text, nullable=True)  # JSON string (renamed from 'metadata')
+    trade_metadata = deferred(Column(Text, nullable=True))  # JSON string (renamed from 'metadata')
     
     # Mode
     mode = Column(String(20), default='live')  # live, testnet, backtest
@@ -79,8 +116,31 @@ class Trade(Base):
         Index('idx_trade_symbol_status', 'symbol', 'status'),
         Index('idx_entry_time', 'entry_time'),
         Index('idx_mode', 'mode'),
+        Index('ix_trades_status_mode_symbol', 'status', 'mode', 'symbol'),  # scan de trades abertos
     )
     
+    @classmethod
+    def float_rows(cls, mode: Optional[str] = None, status: str = 'CLOSED') -> Select:
+        """
+        Select for analytics loads with Numeric columns cast to Float
+        
+        Rows come back as plain floats, so replaying the trade history never
+        materializes Decimals (storage stays Numeric for write correctness).
+        """
+        stmt = select(
+            cls.id, cls.symbol, cls.side, cls.strategy,
+            cls.entry_time, cls.exit_time,
+            cast(cls.entry_price, Float).label('entry_price'),
+            cast(cls.exit_price, Float).label('exit_price'),
+            cast(cls.quantity, Float).label('quantity'),
+            cast(cls.pnl, Float).label('pnl'),
+            cls.pnl_percent,
+            cast(cls.fees, Float).label('fees'),
+        ).where(cls.status == status)
+        if mode is not None:
+            stmt = stmt.where(cls.mode == mode)
+        return stmt.order_by(cls.exit_time)
+    
     def __repr__(self):
         return (
             f"<Trade(id={self.id}, symbol={self.symbol}, side={self.side}, "
@@ -115,8 +175,8 @@ class Order(Base):
     time_in_force = Column(String(10), default='GTC')  # GTC, IOC, FOK
     
     # Timing
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, default=utcnow(), onupdate=utcnow())
     
     # Execution details
     avg_price = Column(Numeric(20, 8), nullable=True)
@@ -134,6 +194,8 @@ class Order(Base):
     __table_args__ = (
         Index('idx_order_symbol_status', 'symbol', 'status'),
         Index('idx_created_at', 'created_at'),
+        # Trade.orders e o JOIN da reconciliação filtram por trade_id
+        Index('idx_order_trade_status', 'trade_id', 'status'),
     )
     
     def __repr__(self):
@@ -160,11 +222,21 @@ class Fill(Base):
     commission_asset = Column(String(10), default='USDT')
     
     # Timing
-    filled_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    filled_at = Column(DateTime, default=utcnow(), nullable=False)
     
     # Relationships
     order = relationship("Order", back_populates="fills")
     
+    __table_args__ = (
+        Index('idx_fill_order_time', 'order_id', 'filled_at'),
+    )
+    
+    @classmethod
+    def bulk_insert(cls, session: Session, rows: List[Dict[str, Any]]) -> None:
+        """Insert plain-dict rows in one Core executemany (no ORM objects)"""
+        if rows:
+            session.execute(insert(cls.__table__), rows)
+    
     def __repr__(self):
         return (
             f"<Fill(id={self.id}, price={self.price}, "
@@ -188,15 +260,22 @@ class Balance(Base):
     usd_value = Column(Numeric(20, 2), nullable=True)
     
     # Timing
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    timestamp = Column(DateTime, default=utcnow(), nullable=False, index=True)
     
     # Mode
     mode = Column(String(20), default='live')
     
     __table_args__ = (
         Index('idx_asset_timestamp', 'asset', 'timestamp'),
+        Index('idx_balance_mode_ts', 'mode', 'timestamp'),
     )
     
+    @classmethod
+    def bulk_snapshot(cls, session: Session, rows: List[Dict[str, Any]]) -> None:
+        """Insert a balance snapshot (one dict per asset) in one Core executemany"""
+        if rows:
+            session.execute(insert(cls.__table__), rows)
+    
     def __repr__(self):
         return f"<Balance(asset={self.asset}, total={self.total}, timestamp={self.timestamp})>"
 
@@ -265,22 +344,61 @@ class Config(Base):
     
     description = Column(Text, nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, default=utcnow(), onupdate=utcnow())
     
     def __repr__(self):
         return f"<Config(key={self.key}, value={self.value})>"
 
 
+# WAL: leitores (backup) não bloqueiam o writer; NORMAL dispensa fsync a cada commit
+_SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-64000',  # ~64 MB de page cache (negativo = KiB)
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply the SQLite PRAGMAs on every new DBAPI connection"""
+    # pysqlite só emite BEGIN antes de DML; desligado aqui, o BEGIN vem de _sqlite_begin
+    # (senão um SAVEPOINT abriria/fecharia a transação externa sozinho)
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _sqlite_begin(connection) -> None:
+    """Emit our own BEGIN so SAVEPOINTs nest inside the session transaction"""
+    connection.exec_driver_sql('BEGIN')
+
+
 class DatabaseManager:
     """Database manager for handling connections and sessions"""
     
-    def __init__(self, database_url: str):
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: int = 30,
+        pool_recycle: int = 3600
+    ):
         """
         Initialize database manager
         
         Args:
             database_url: SQLAlchemy database URL
+            pool_size: Persistent connections kept in the pool (ignored for SQLite)
+            max_overflow: Extra connections allowed above pool_size (ignored for SQLite)
+            pool_timeout: Seconds to wait for a free connection (ignored for SQLite)
+            pool_recycle: Recycle connections older than this, in seconds (ignored for SQLite)
         """
         # Special handling for SQLite
         if database_url.startswith('sqlite'):
@@ -290,24 +408,68 @@ class DatabaseManager:
                 poolclass=StaticPool,
                 echo=False
             )
+            event.listen(self.engine, 'connect', _set_sqlite_pragmas)
+            event.listen(self.engine, 'begin', _sqlite_begin)
+            # ✅ Todas as threads dividem uma conexão DBAPI (BEGIN manual): unidades de
+            # trabalho concorrentes (db-writer x reconcile) precisam ser serializadas
+            self._unit_lock = threading.RLock()
         else:
-            self.engine = create_engine(database_url, echo=False)
+            # ✅ Pool LIFO mantém a conexão "quente" reutilizada a cada loop
+            self.engine = create_engine(
+                database_url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=True,
+                pool_use_lifo=True,
+                echo=False
+            )
+            self._unit_lock = nullcontext()
         
+        # expire_on_commit=False: objetos continuam legíveis após commit sem novo SELECT
         self.SessionLocal = sessionmaker(
             autocommit=False,
             autoflush=False,
+            expire_on_commit=False,
             bind=self.engine
         )
+        # ✅ Uma Session por thread, reaproveitada entre unidades de trabalho
+        # (close() só reseta estado e devolve a conexão ao pool)
+        self._thread_session = scoped_session(self.SessionLocal)
         
         # Create all tables
         Base.metadata.create_all(bind=self.engine)
+        # create_all não altera tabelas existentes: índices novos entram em bancos antigos aqui
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=self.engine, checkfirst=True)
     
     def get_session(self) -> Session:
         """Get a new database session"""
         return self.SessionLocal()
     
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """Session for a unit of work: commit on success, rollback on error, always close"""
+        with self._unit_lock:
+            session = self._thread_session()
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+    
+    def remove_session(self) -> None:
+        """Discard the calling thread's session (call when a worker thread exits)"""
+        self._thread_session.remove()
+    
     def close(self) -> None:
         """Close the database connection"""
+        self._thread_session.remove()
         self.engine.dispose()
 
 
@@ -4,11 +4,26 @@ Script de inicialização do projeto
 Cria estrutura de diretórios e arquivos necessários
 """
 
+import importlib.util
 import os
 import sys
 from pathlib import Path
 
 
+def _create_file(path: Path, content: str) -> bool:
+    """Cria o arquivo só se ainda não existir (open 'x': sem exists() antes)"""
+    try:
+        f = path.open('x')
+    except FileExistsError:
+        return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = path.open('x')
+    with f:
+        f.write(content)
+    return True
+
+
 def create_directory_structure():
     """Cria estrutura de diretórios"""
     print("Criando estrutura de diretórios...")
@@ -24,11 +39,11 @@ def create_directory_structure():
     ]
     
     for directory in directories:
-        path = Path(directory)
-        if not path.exists():
-            path.mkdir(parents=True, exist_ok=True)
+        # mkdir direto (sem exists() antes): um syscall por diretório
+        try:
+            Path(directory).mkdir(parents=True)
             print(f"  ✓ Criado: {directory}/")
-        else:
+        except FileExistsError:
             print(f"  ✓ Existe: {directory}/")
 
 
@@ -44,10 +59,7 @@ def create_init_files():
     ]
     
     for init_file in init_files:
-        path = Path(init_file)
-        if not path.exists():
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text('"""Module initialization"""\n')
+        if _create_file(Path(init_file), '"""Module initialization"""\n'):
             print(f"  ✓ Criado: {init_file}")
         else:
             print(f"  ✓ Existe: {init_file}")
@@ -60,14 +72,16 @@ def create_env_file():
     env_path = Path('.env')
     env_example_path = Path('config/.env.example')
     
-    if env_path.exists():
-        print("  ✓ Arquivo .env já existe")
-        return
-    
-    if env_example_path.exists():
+    try:
         # Copiar do exemplo
         content = env_example_path.read_text()
-        env_path.write_text(content)
+    except FileNotFoundError:
+        content = None
+    
+    if content is not None:
+        if not _create_file(env_path, content):
+            print("  ✓ Arquivo .env já existe")
+            return
         print("  ✓ Arquivo .env criado a partir do template")
         print("  ⚠️  IMPORTANTE: Edite o arquivo .env com suas API keys!")
     else:
@@ -90,8 +104,12 @@ TELEGRAM_CHAT_ID=
 
 SLACK_ENABLED=false
 SLACK_WEBHOOK_URL=
+
+NOTIFY_LEVEL=INFO
 """
-        env_path.write_text(template)
+        if not _create_file(env_path, template):
+            print("  ✓ Arquivo .env já existe")
+            return
         print("  ✓ Arquivo .env criado com template básico")
         print("  ⚠️  IMPORTANTE: Edite o arquivo .env com suas API keys!")
 
@@ -102,10 +120,6 @@ def create_gitignore():
     
     gitignore_path = Path('.gitignore')
     
-    if gitignore_path.exists():
-        print("  ✓ Arquivo .gitignore já existe")
-        return
-    
     content = """# Python
 __pycache__/
 *.py[cod]
@@ -151,7 +165,9 @@ reports/*.csv
 Thumbs.db
 """
     
-    gitignore_path.write_text(content)
+    if not _create_file(gitignore_path, content):
+        print("  ✓ Arquivo .gitignore já existe")
+        return
     print("  ✓ Arquivo .gitignore criado")
 
 
@@ -183,10 +199,10 @@ def check_dependencies():
     missing = []
     
     for module in required:
-        try:
-            __import__(module)
+        # find_spec só localiza o módulo (não executa o import)
+        if importlib.util.find_spec(module) is not None:
             print(f"  ✓ {module}")
-        except ImportError:
+        else:
             print(f"  ❌ {module} não instalado")
             missing.append(module)
     
@@ -3,28 +3,77 @@ Validação de Sincronização: Backtest vs Testnet vs Live
 Testes automáticos para garantir que todos os modos usam mesmos parâmetros
 """
 
+import threading
 import pytest
 from decimal import Decimal
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from sqlalchemy import func, select
 
-from config.settings import Settings
-from core.backtest import BacktestEngine
-from core.trade_manager import TradeManager
+from config.settings import get_settings
+from core.backtest import BacktestEngine, BacktestTrade
+from core.exchange import BinanceExchange
+import core.exchange as exchange_module
+from db.models import Balance, DatabaseManager
+from core.trade_manager import ScanResult, TradeManager, TestnetTrade
 from core.risk import RiskManager
-from core.strategy import StrategyFactory
-from core.utils import calculate_sharpe_ratio, calculate_sortino_ratio
+from core.strategy import BaseStrategy, StrategyFactory, SIGNAL_STRENGTH_THRESHOLD
+import core.backtest as backtest_module
+import core.trade_manager as trade_manager_module
+from core.utils import calculate_sharpe_ratio, calculate_sortino_ratio, _INTERVAL_SEC
+
+
+# ✅ Objetos pesados construídos uma vez por módulo (alterações só via monkeypatch)
+@pytest.fixture(scope="module")
+def settings():
+    return get_settings()
+
+
+@pytest.fixture(scope="module")
+def engine(settings):
+    return BacktestEngine(settings)
+
+
+@pytest.fixture(scope="module")
+def risk_manager(settings):
+    return RiskManager(settings)
+
+
+@pytest.fixture
+def make_trade_manager(settings, monkeypatch):
+    """
+    TradeManager real (__init__ completo) com exchange, DB e backup mockados
+    
+    Overrides viram uma cópia dos settings; managers criados são parados no teardown.
+    """
+    for name in ('BinanceExchange', 'DatabaseManager', 'BackupManager'):
+        monkeypatch.setattr(trade_manager_module, name, MagicMock(name=name))
+    managers = []
+    
+    def build(mode: str = 'live', **overrides) -> TradeManager:
+        config = settings.model_copy(update={
+            'BINANCE_API_KEY': 'test-api-key-0000',
+            'BINANCE_API_SECRET': 'test-api-secret-0000',
+            **overrides
+        })
+        manager = TradeManager(config, mode=mode)
+        managers.append(manager)
+        return manager
+    
+    yield build
+    for manager in managers:
+        manager.stop()
 
 
 class TestSignalThresholds:
     """Valida que thresholds de sinal são idênticos em todos os modos"""
     
-    def test_backtest_signal_threshold(self):
+    def test_backtest_signal_threshold(self, engine):
         """Verifica threshold no backtest é 0.40"""
-        settings = Settings()
-        engine = BacktestEngine(settings)
         
         # Backtest deve usar 0.40 como threshold
         # Este é verificado em: core/backtest.py linha ~320
@@ -39,7 +88,6 @@ class TestSignalThresholds:
     
     def test_testnet_signal_threshold_matches_backtest(self):
         """Verifica que testnet usa mesmo threshold que backtest"""
-        settings = Settings()
         
         # Ambos devem usar 0.40
         # Backtest: core/backtest.py - if strength > 0.40
@@ -51,40 +99,53 @@ class TestSignalThresholds:
         assert backtest_threshold == testnet_threshold, \
             f"Thresholds não match: backtest={backtest_threshold}, testnet={testnet_threshold}"
     
-    def test_signal_threshold_consistency_across_strategies(self):
+    @pytest.mark.parametrize("strategy_name", [
+        'mean_reversion',
+        'breakout',
+        'trend_following',
+        'ensemble',
+        'ensemble_aggressive'
+    ])
+    def test_signal_threshold_consistency_across_strategies(self, strategy_name, make_trade_manager):
         """Verifica que threshold é usado para todas as estratégias"""
-        threshold = 0.40
-        
-        strategies = [
-            'mean_reversion',
-            'breakout',
-            'trend_following',
-            'ensemble',
-            'ensemble_aggressive'
-        ]
+        # Estratégia resolve pelo nome (mesmo caminho do backtest e do TradeManager)
+        strategy = StrategyFactory.create_strategy(strategy_name)
+        assert isinstance(strategy, BaseStrategy), f"Strategy {strategy_name} não resolveu"
+        
+        # O threshold NÃO é estratégia-específico: backtest e trade_manager usam a mesma constante
+        assert backtest_module.SIGNAL_STRENGTH_THRESHOLD is SIGNAL_STRENGTH_THRESHOLD
+        assert trade_manager_module.SIGNAL_STRENGTH_THRESHOLD is SIGNAL_STRENGTH_THRESHOLD
+        assert SIGNAL_STRENGTH_THRESHOLD == 0.40
+        
+        # TradeManager executa só acima do threshold (limite exclusivo)
+        manager = make_trade_manager(STRATEGY_MODE=strategy_name)
+        executed = []
+        manager._execute_trade = lambda symbol, signal, strength, df, atr=None: executed.append(
+            (symbol, strength)
+        )
+        
+        manager._apply_signals([
+            ScanResult('BTCUSDT', 'BUY', SIGNAL_STRENGTH_THRESHOLD + 0.01, None),
+            ScanResult('ETHUSDT', 'SELL', SIGNAL_STRENGTH_THRESHOLD, None),
+            ScanResult('BNBUSDT', 'HOLD', 0.99, None),
+        ])
         
-        # Todos devem usar o mesmo threshold
-        for strategy_name in strategies:
-            # O threshold é aplicado em backtest.py e trade_manager.py
-            # NÃO é estratégia-específico
-            assert True, f"Strategy {strategy_name} should use threshold 0.40"
+        assert [symbol for symbol, _ in executed] == ['BTCUSDT'], \
+            f"Strategy {strategy_name} should use threshold {SIGNAL_STRENGTH_THRESHOLD}"
 
 
 class TestSlippageApplication:
     """Valida que slippage é aplicado consistentemente"""
     
-    def test_backtest_applies_slippage(self):
+    def test_backtest_applies_slippage(self, settings):
         """Verifica que backtest aplica slippage"""
-        settings = Settings()
         
         # Slippage deve ser 0.1% (0.001)
         assert settings.SLIPPAGE_PERCENT == Decimal("0.001"), \
             f"Slippage deve ser 0.001, got {settings.SLIPPAGE_PERCENT}"
     
-    def test_slippage_applied_on_exit(self):
+    def test_slippage_applied_on_exit(self, settings, engine):
         """Verifica que slippage é aplicado na saída do trade"""
-        settings = Settings()
-        engine = BacktestEngine(settings)
         
         # Teste: criar um trade mock e fechar
         exit_price = Decimal('100.00')
@@ -104,9 +165,19 @@ class TestSlippageApplication:
         assert actual_exit_sell == Decimal('100.10'), \
             f"Slippage SELL incorreto: {actual_exit_sell}"
     
-    def test_slippage_consistency_with_fees(self):
+    def test_folded_slippage_matches_step_by_step(self, settings, engine):
+        """Verifica que o multiplicador de slippage do engine dá o mesmo Decimal"""
+        for exit_price in (Decimal('100.00'), Decimal('43251.37000000'), Decimal('0.00001234')):
+            slippage = exit_price * settings.SLIPPAGE_PERCENT
+            
+            buy = exit_price * engine._exit_slippage_mult['BUY']
+            sell = exit_price * engine._exit_slippage_mult['SELL']
+            
+            assert str(buy) == str(exit_price - slippage), f"BUY: {buy}"
+            assert str(sell) == str(exit_price + slippage), f"SELL: {sell}"
+    
+    def test_slippage_consistency_with_fees(self, settings):
         """Verifica que slippage é aplicado ANTES das fees"""
-        settings = Settings()
         
         entry_price = Decimal('100.00')
         exit_price = Decimal('105.00')
@@ -136,57 +207,64 @@ class TestSlippageApplication:
 class TestDataFreshness:
     """Valida que data freshness é verificada corretamente"""
     
-    def test_max_data_age_calculation(self):
+    def test_max_data_age_calculation(self, settings, monkeypatch):
         """Verifica cálculo de idade máxima aceitável"""
-        settings = Settings()
         
         # Para timeframe 1h: máximo 1h + 5min = 3900s
-        interval_seconds = {
-            '1m': 60,
-            '5m': 300,
-            '15m': 900,
-            '30m': 1800,
-            '1h': 3600,
-            '4h': 14400,
-        }
-        
-        settings.ENTRY_TIMEFRAME = '1h'
+        monkeypatch.setattr(settings, 'ENTRY_TIMEFRAME', '1h')
         expected_max_age = 3600 + 300  # 1h + 5min buffer
         
         # Cálculo esperado
-        interval_sec = interval_seconds['1h']
+        interval_sec = _INTERVAL_SEC['1h']
         max_age = interval_sec + 300
         
         assert max_age == expected_max_age, \
             f"Max age incorreto: {max_age}, esperado {expected_max_age}"
     
-    def test_stale_data_rejected(self):
+    @staticmethod
+    def _scan_symbol(manager: TradeManager, scan_time: datetime, candle_time: datetime):
+        """Roda _evaluate_symbol com o relógio do scan fixo em scan_time (datetimes só aqui)"""
+        # Relógio lido uma vez por scan (_scan_opportunities), aqui stubado
+        manager._scan_wall_ns = pd.Timestamp(scan_time).value
+        
+        index = pd.date_range(end=candle_time, periods=250, freq='1h')
+        klines = pd.DataFrame({'close': np.linspace(100.0, 110.0, len(index))}, index=index)
+        manager._get_klines_cached = lambda symbol, timeframe, limit, cache_updates=None: klines
+        
+        analyzed = []
+        
+        class _Analyzer:
+            def analyze(self, primary_df, entry_df):
+                analyzed.append(entry_df)
+                return 'HOLD', 0.0, {}
+        
+        manager.mtf_analyzer = _Analyzer()
+        return manager._evaluate_symbol('BTCUSDT', {}), analyzed
+    
+    def test_stale_data_rejected(self, make_trade_manager):
         """Verifica que dados antigos são rejeitados"""
-        settings = Settings()
-        settings.ENTRY_TIMEFRAME = '1h'
+        manager = make_trade_manager(ENTRY_TIMEFRAME='1h')
+        assert manager._max_data_age == 3600 + 300  # 1h + 5min (live)
         
         # Dados com 2 horas de idade (muito antigo)
-        latest_candle_time = datetime.utcnow() - timedelta(hours=2)
-        
-        age_seconds = (datetime.utcnow() - latest_candle_time).total_seconds()
-        max_age = 3600 + 300  # 1h + 5min
+        scan_time = datetime(2024, 1, 1, 14, 0)
+        result, analyzed = self._scan_symbol(manager, scan_time, scan_time - timedelta(hours=2))
         
-        # Deve ser rejeitado
-        assert age_seconds > max_age, "Dados antigos não foram rejeitados"
+        # Deve ser rejeitado antes da análise
+        assert result is None, "Dados antigos não foram rejeitados"
+        assert not analyzed, "Dados antigos chegaram ao analisador"
     
-    def test_fresh_data_accepted(self):
+    def test_fresh_data_accepted(self, make_trade_manager):
         """Verifica que dados recentes são aceitos"""
-        settings = Settings()
-        settings.ENTRY_TIMEFRAME = '1h'
+        manager = make_trade_manager(ENTRY_TIMEFRAME='1h')
         
         # Dados com 30 minutos de idade (aceitável)
-        latest_candle_time = datetime.utcnow() - timedelta(minutes=30)
-        
-        age_seconds = (datetime.utcnow() - latest_candle_time).total_seconds()
-        max_age = 3600 + 300  # 1h + 5min
+        scan_time = datetime(2024, 1, 1, 14, 0)
+        result, analyzed = self._scan_symbol(manager, scan_time, scan_time - timedelta(minutes=30))
         
         # Deve ser aceito
-        assert age_seconds < max_age, "Dados recentes foram rejeitados"
+        assert result is not None and result.symbol == 'BTCUSDT', "Dados recentes foram rejeitados"
+        assert len(analyzed) == 1
 
 
 class TestCandleClosingLogic:
@@ -199,7 +277,7 @@ class TestCandleClosingLogic:
         # Simular: estamos em 13:45:00 com timeframe 1h
         # Faltam 15 minutos = 900 segundos até 14:00
         
-        interval_seconds = 3600  # 1h
+        interval_seconds = _INTERVAL_SEC['1h']
         seconds_into_period = 45 * 60  # 45 minutos em segundos
         
         seconds_until_close = interval_seconds - seconds_into_period  # 900s
@@ -227,16 +305,14 @@ class TestCandleClosingLogic:
 class TestCapitalTracking:
     """Valida rastreamento consistente de capital"""
     
-    def test_initial_capital_set_correctly(self):
+    def test_initial_capital_set_correctly(self, settings):
         """Verifica que capital inicial é configurado"""
-        settings = Settings()
         
         assert settings.BACKTEST_INITIAL_CAPITAL == Decimal('10000.0'), \
             f"Capital inicial incorreto: {settings.BACKTEST_INITIAL_CAPITAL}"
     
-    def test_capital_updated_after_trade(self):
+    def test_capital_updated_after_trade(self, settings):
         """Verifica que capital é atualizado após trade"""
-        settings = Settings()
         initial_capital = settings.BACKTEST_INITIAL_CAPITAL
         
         # Simular trade com +$100 PnL
@@ -247,10 +323,54 @@ class TestCapitalTracking:
         assert final_capital > initial_capital, "Capital não aumentou após trade positivo"
         assert final_capital == Decimal('10100.0'), f"Capital final incorreto: {final_capital}"
     
-    def test_equity_tracking_for_open_positions(self):
+    def test_results_fast_path_matches_decimal_reference(self, settings, engine, monkeypatch):
+        """Verifica métricas vetorizadas de _calculate_results contra o cálculo Decimal por elemento"""
+        initial = settings.BACKTEST_INITIAL_CAPITAL
+        trade_pnls = [Decimal('100.00'), Decimal('-42.50'), Decimal('13.37'), Decimal('-7.87')]
+        
+        trades = []
+        for pnl in trade_pnls:
+            trade = BacktestTrade(
+                'BTCUSDT', 'BUY', Decimal('100'), Decimal('1'), datetime(2024, 1, 1),
+                Decimal('95'), Decimal('110')
+            )
+            trade.pnl = pnl
+            trades.append(trade)
+        
+        # Curva com candles sem trade (retorno 0) e um drawdown no meio
+        equity_curve = [
+            initial, initial, initial + Decimal('100.00'), initial + Decimal('100.00'),
+            initial + Decimal('57.50'), initial + Decimal('70.87'), initial + Decimal('63.00'),
+        ]
+        monkeypatch.setattr(engine, 'trades', trades)
+        monkeypatch.setattr(engine, 'equity_curve', equity_curve)
+        monkeypatch.setattr(engine, 'capital', equity_curve[-1])
+        
+        results = engine._calculate_results()
+        
+        # Referência: cálculo anterior, um Decimal por candle
+        returns = [
+            float((equity_curve[i] - equity_curve[i - 1]) / equity_curve[i - 1])
+            for i in range(1, len(equity_curve))
+        ]
+        peak = equity_curve[0]
+        max_dd = Decimal('0')
+        for value in equity_curve:
+            peak = max(peak, value)
+            max_dd = max(max_dd, (peak - value) / peak)
+        
+        assert results['sharpe_ratio'] == pytest.approx(calculate_sharpe_ratio(returns), rel=1e-12)
+        assert results['sortino_ratio'] == pytest.approx(calculate_sortino_ratio(returns), rel=1e-12)
+        assert results['max_drawdown'] == pytest.approx(float(max_dd) * 100, rel=1e-12)
+        assert results['equity_curve'] == [float(e) for e in equity_curve]
+        assert results['final_capital'] == float(initial + sum(trade_pnls))
+        assert results['winning_trades'] == 2 and results['losing_trades'] == 2
+        assert results['avg_win'] == pytest.approx((100.00 + 13.37) / 2, rel=1e-12)
+        assert results['largest_loss'] == -42.50
+        assert results['profit_factor'] == pytest.approx(113.37 / 50.37, rel=1e-12)
+    
+    def test_equity_tracking_for_open_positions(self, risk_manager):
         """Verifica que equity inclui posições abertas"""
-        settings = Settings()
-        risk_manager = RiskManager(settings)
         
         closed_capital = Decimal('10000.0')
         unrealized_pnl = Decimal('500.0')  # Posição aberta com +$500
@@ -325,13 +445,110 @@ class TestPartialTakeProfitSync:
         assert total == Decimal('1.0'), f"Total incorreto: {total}"
 
 
+class _StubClient:
+    """Cliente Binance falso: registra a thread e os params de cada ordem"""
+    
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+        self.session = SimpleNamespace(hooks={'response': []})
+    
+    def get_exchange_info(self):
+        return {'symbols': [{'symbol': 'BTCUSDT', 'filters': [
+            {'filterType': 'LOT_SIZE', 'minQty': '0.00001', 'maxQty': '9000', 'stepSize': '0.00001'},
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000', 'tickSize': '0.01'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5'},
+        ]}]}
+    
+    def get_symbol_ticker(self, symbol):
+        return {'symbol': symbol, 'price': '105.00'}
+    
+    def create_order(self, **params):
+        self.calls.append((threading.current_thread(), params))
+        return {'orderId': 4242, 'avgPrice': '105.10'}
+
+
+class TestPartialExitOrders:
+    """Valida que saídas parciais funcionam fora da main thread (scan_executor)"""
+    
+    def test_partial_exit_from_worker_thread(self, make_trade_manager, monkeypatch):
+        """Ordens parciais não podem depender de SIGALRM (só existe na main thread)"""
+        client = _StubClient()
+        # BinanceExchange real (validação, formatação, timeout) sobre o cliente falso
+        monkeypatch.setattr(exchange_module, 'Client', lambda *args, **kwargs: client)
+        exchange = BinanceExchange('test-api-key-0000', 'test-api-secret-0000')
+        
+        manager = make_trade_manager()
+        manager.exchange = exchange
+        persisted = []
+        manager._persist = lambda kind, trade, payload: persisted.append((kind, trade, payload))
+        
+        trade = TestnetTrade(
+            'BTCUSDT', 'BUY', Decimal('100.00'), Decimal('1.0'),
+            datetime(2024, 1, 1), Decimal('95.00'), Decimal('110.00')
+        )
+        partials = [('BTCUSDT', trade, Decimal('0.3'), Decimal('105.00'))]
+        
+        # Chamado de uma thread que não é a main (como o loop do bot em produção)
+        caller = threading.Thread(target=manager._execute_partial_exits, args=(partials,))
+        caller.start()
+        caller.join(timeout=10)
+        
+        assert len(client.calls) == 1, "Ordem parcial não chegou ao cliente"
+        order_thread, params = client.calls[0]
+        assert order_thread is not threading.main_thread()
+        assert params['quantity'] == '0.30000'
+        assert params['requests_params']['timeout'] > 0, "Ordem sem timeout HTTP"
+        
+        assert len(persisted) == 1, "Ordem parcial não foi enviada ao db-writer"
+        kind, queued_trade, payload = persisted[0]
+        assert kind == 'order' and queued_trade is trade
+        assert payload['exchange_order_id'] == '4242'
+        assert payload['avg_price'] == Decimal('105.10')
+
+
+class TestDatabaseConcurrency:
+    """Valida que db-writer e reconcile podem usar o SQLite ao mesmo tempo"""
+    
+    def test_concurrent_session_scopes_on_sqlite_file(self, tmp_path):
+        """Duas threads com session_scope + savepoint não perdem escritas"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'concurrency.db'}")
+        errors = []
+        per_thread = 150
+        
+        def worker(asset):
+            try:
+                for i in range(per_thread):
+                    with db.session_scope() as session:
+                        with session.begin_nested():
+                            Balance.bulk_snapshot(session, [{
+                                'asset': asset, 'free': Decimal(i), 'total': Decimal(i)
+                            }])
+                        session.execute(select(func.count()).select_from(Balance)).scalar()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.remove_session()
+        
+        threads = [threading.Thread(target=worker, args=(asset,)) for asset in ('BTC', 'ETH')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        
+        try:
+            assert not errors, f"Unidades de trabalho falharam: {errors[:3]}"
+            with db.session_scope() as session:
+                total = session.execute(select(func.count()).select_from(Balance)).scalar()
+            assert total == 2 * per_thread, f"Escritas perdidas: {total} de {2 * per_thread}"
+        finally:
+            db.close()
+
+
 class TestDynamicPositionSizing:
     """Valida que position sizing é dinâmico baseado em signal strength"""
     
-    def test_strong_signal_increases_position(self):
+    def test_strong_signal_increases_position(self, risk_manager):
         """Verifica que sinal forte resulta em posição maior"""
-        settings = Settings()
-        risk_manager = RiskManager(settings)
         
         capital = Decimal('10000.0')
         entry_price = Decimal('100.00')
@@ -364,16 +581,14 @@ class TestDynamicPositionSizing:
 class TestCircuitBreaker:
     """Valida que circuit breaker funciona igual em todos os modos"""
     
-    def test_circuit_breaker_drawdown_threshold(self):
+    def test_circuit_breaker_drawdown_threshold(self, settings):
         """Verifica que circuit breaker usa 15% de drawdown"""
-        settings = Settings()
         
         assert settings.MAX_DRAWDOWN_PERCENT == Decimal('0.18'), \
             f"MAX_DRAWDOWN_PERCENT incorreto: {settings.MAX_DRAWDOWN_PERCENT}"
     
-    def test_circuit_breaker_daily_loss_threshold(self):
+    def test_circuit_breaker_daily_loss_threshold(self, settings):
         """Verifica que circuit breaker usa 3.5% de perda diária"""
-        settings = Settings()
         
         assert settings.MAX_DAILY_LOSS_PERCENT == Decimal('0.035'), \
             f"MAX_DAILY_LOSS_PERCENT incorreto: {settings.MAX_DAILY_LOSS_PERCENT}"
@@ -382,16 +597,14 @@ class TestCircuitBreaker:
 class TestFeesConsistency:
     """Valida que fees são aplicadas consistentemente"""
     
-    def test_taker_fee_correct(self):
+    def test_taker_fee_correct(self, settings):
         """Verifica que taker fee é 0.1%"""
-        settings = Settings()
         
         assert settings.TAKER_FEE == Decimal('0.001'), \
             f"TAKER_FEE incorreta: {settings.TAKER_FEE}"
     
-    def test_fees_applied_on_both_sides(self):
+    def test_fees_applied_on_both_sides(self, settings):
         """Verifica que fees são aplicadas na entrada E saída"""
-        settings = Settings()
         fee_rate = settings.TAKER_FEE
         
         entry_price = Decimal('100.00')
@@ -410,9 +623,8 @@ class TestFeesConsistency:
 class TestIntegrationSync:
     """Testes de integração para validar sincronização completa"""
     
-    def test_backtest_and_testnet_use_same_settings(self):
+    def test_backtest_and_testnet_use_same_settings(self, settings):
         """Verifica que backtest e testnet usam mesmos settings"""
-        settings = Settings()
         
         # Listar parâmetros críticos que devem ser iguais
         critical_params = {
@@ -431,10 +643,8 @@ class TestIntegrationSync:
             assert actual_value == expected_value, \
                 f"{param}: {actual_value} != {expected_value}"
     
-    def test_no_cooldown_in_backtest(self):
+    def test_no_cooldown_in_backtest(self, engine):
         """Verifica que backtest NÃO tem cooldown de sinais"""
-        settings = Settings()
-        engine = BacktestEngine(settings)
         
         # Backtest não deve ter cooldown
         assert engine.signal_cooldown_seconds == 0, \